@@ -1,10 +1,49 @@
+import re
+
 from django.contrib import admin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import Comment, Follow, Group, Post, User
+from .search import match_posts, tokenize
+from .settings import ADMIN_COUNT_LIMIT
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Постраничный вывод без полного COUNT(*): строки считаются только
+    до ADMIN_COUNT_LIMIT. Ссылки ведут на страницы в пределах этого
+    числа, а дальние страницы доступны по номеру в параметре ?p=.
+    """
 
-from .models import Comment, Follow, Group, Post
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[:ADMIN_COUNT_LIMIT].count()
+
+    def page(self, number):
+        if self.count < ADMIN_COUNT_LIMIT:
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        bottom = (number - 1) * self.per_page
+        rows = self.object_list[bottom:bottom + self.per_page]
+        if number > self.num_pages and not rows:
+            raise EmptyPage('На странице нет результатов')
+        return self._get_page(rows, number, self)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'text',
@@ -12,6 +51,14 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group'
     )
+    list_select_related = (
+        'author',
+        'group',
+    )
+    raw_id_fields = (
+        'author',
+        'group',
+    )
     search_fields = (
         'text',
     )
@@ -21,6 +68,11 @@ class PostAdmin(admin.ModelAdmin):
     )
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return match_posts(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -30,7 +82,8 @@ class GroupAdmin(admin.ModelAdmin):
         'description',
     )
     search_fields = (
-        'text',
+        'title',
+        'slug',
     )
     prepopulated_fields = {
         'slug': ('title',)
@@ -39,18 +92,61 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = (
         'user',
         'author',
     )
+    list_select_related = (
+        'user',
+        'author',
+    )
+    raw_id_fields = (
+        'user',
+        'author',
+    )
+    search_fields = (
+        '=user__username',
+        '=author__username',
+    )
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'post',
         'author',
         'text',
         'created',
     )
+    list_select_related = (
+        'author',
+        'post__author',
+        'post__group',
+    )
+    raw_id_fields = (
+        'post',
+        'author',
+    )
+    search_fields = (
+        '=author__username',
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Комментарии автора с таким именем или с текстом, содержащим все
+        слова запроса. Регулярное выражение проверяет только комментарии
+        записей, найденных по поисковому индексу, а обе ветки условия
+        идут по индексам, без просмотра всей таблицы.
+        """
+        if not search_term:
+            return queryset, False
+        authors = User.objects.filter(username=search_term.strip())
+        posts = match_posts(Post.objects.order_by(), search_term)
+        by_text = Comment.objects.filter(post__in=posts.values('id'))
+        for term in tokenize(search_term):
+            by_text = by_text.filter(text__iregex=re.escape(term))
+        return queryset.filter(
+            Q(author__in=authors.values('id'))
+            | Q(id__in=by_text.values('id'))
+        ), False
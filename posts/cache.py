@@ -0,0 +1,250 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .paginator import CursorPaginator
+from .settings import (FEED_CACHE_LOCK_POLL, FEED_CACHE_LOCK_TIMEOUT,
+                       FEED_CACHE_STALE_GENERATIONS, FEED_CACHE_STALE_TIMEOUT,
+                       FEED_CACHE_STATS_BATCH, FEED_CACHE_STATS_INTERVAL,
+                       FEED_CACHE_TIMEOUT, PAGE_POSTS_COUNT)
+
+FEED_VERSION_KEY = 'feed:version'
+FOLLOW_VERSION_KEY = 'follow:version'
+FEED_STATS_EVENTS = ('hit', 'miss', 'stale')
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def get_feed_version():
+    """Поколение кэша лент: меняется при каждом изменении данных ленты"""
+    return get_version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+
+
+def get_follow_version():
+    """Поколение подписок: меняется при каждой подписке и отписке"""
+    return get_version(FOLLOW_VERSION_KEY)
+
+
+def bump_follow_version():
+    bump_version(FOLLOW_VERSION_KEY)
+
+
+def make_page_key(namespace, after_values, before_values):
+    """
+    Ключ страницы по декодированным значениям курсоров: любые неверные
+    курсоры дают ключ первой страницы, а не новую запись в кэше
+    """
+    cursors = json.dumps([after_values, before_values], default=str)
+    return f'feed:{namespace}:{hashlib.md5(cursors.encode()).hexdigest()}'
+
+
+class EventCounter:
+    """
+    Копит счётчики событий в памяти процесса и добавляет их в общий кэш
+    пачками: не чаще раза в interval секунд или каждые batch событий.
+    Так чтение страницы не превращается в запись в кэш.
+    """
+
+    def __init__(self, prefix, batch, interval):
+        self.prefix = prefix
+        self.batch = batch
+        self.interval = interval
+        self.pending = Counter()
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+
+    def add(self, event):
+        with self.lock:
+            self.pending[event] += 1
+            if (
+                sum(self.pending.values()) < self.batch
+                and time.monotonic() - self.flushed < self.interval
+            ):
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending = dict(self.pending)
+            self.pending.clear()
+            self.flushed = time.monotonic()
+        for event, count in pending.items():
+            key = f'{self.prefix}:{event}'
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+
+    def get(self, events):
+        self.flush()
+        return {
+            event: cache.get(f'{self.prefix}:{event}', 0) for event in events
+        }
+
+    def reset(self, events):
+        with self.lock:
+            self.pending.clear()
+        cache.delete_many([f'{self.prefix}:{event}' for event in events])
+
+
+feed_stats = EventCounter(
+    'feed:stats', FEED_CACHE_STATS_BATCH, FEED_CACHE_STATS_INTERVAL
+)
+
+
+def count_event(event):
+    feed_stats.add(event)
+
+
+def get_cache_stats():
+    return feed_stats.get(FEED_STATS_EVENTS)
+
+
+def reset_cache_stats():
+    feed_stats.reset(FEED_STATS_EVENTS)
+
+
+def get_stale(key, version):
+    """
+    Копия прошлых поколений и её поколение, если она отстала не больше
+    допустимого
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if 0 <= version - entry[1] <= FEED_CACHE_STALE_GENERATIONS:
+        return entry
+    return None
+
+
+def get_or_compute(key, compute, timeout, version):
+    return get_or_compute_versioned(key, compute, timeout, version)[0]
+
+
+def get_or_compute_versioned(key, compute, timeout, version):
+    """
+    Значение из кэша с пересчётом в один поток (single-flight) и поколение,
+    для которого оно посчитано. Пересчитывает только воркер, захвативший
+    блокировку. Остальные тем временем получают устаревшую копию не старше
+    FEED_CACHE_STALE_GENERATIONS поколений, а если её нет — ждут
+    результата пересчёта.
+    """
+    entry = cache.get(key, version=version)
+    if entry is not None and entry[1] > time.time():
+        count_event('hit')
+        return entry[0], version
+    lock_key = f'{key}:lock'
+    stale_key = f'{key}:stale'
+    if cache.add(lock_key, 1, FEED_CACHE_LOCK_TIMEOUT, version=version):
+        try:
+            value = compute()
+            cache.set(key, (value, time.time() + timeout),
+                      timeout + FEED_CACHE_STALE_TIMEOUT, version=version)
+            cache.set(stale_key, (value, version),
+                      timeout + FEED_CACHE_STALE_TIMEOUT)
+        finally:
+            cache.delete(lock_key, version=version)
+        count_event('miss')
+        return value, version
+    if entry is not None:
+        stale = entry[0], version
+    else:
+        stale = get_stale(stale_key, version)
+    if stale is not None:
+        count_event('stale')
+        return stale
+    deadline = time.monotonic() + FEED_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(FEED_CACHE_LOCK_POLL)
+        entry = cache.get(key, version=version)
+        if entry is not None:
+            count_event('hit')
+            return entry[0], version
+    count_event('miss')
+    return compute(), version
+
+
+def get_cached_page(request, namespace, posts, per_page=PAGE_POSTS_COUNT):
+    """
+    Страница ленты, общая для всех пользователей. Хранится в кэше под
+    текущим поколением, поэтому устаревает ровно при изменении данных.
+    Если отдана копия прошлого поколения, request.stale_page истинно.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    paginator = CursorPaginator(posts, per_page)
+
+    def compute():
+        page = paginator.get_page(after=after, before=before)
+        return page.object_list, page.previous_cursor, page.next_cursor
+
+    version = get_feed_version()
+    cached, cached_version = get_or_compute_versioned(
+        make_page_key(namespace, *paginator.decode_cursors(after, before)),
+        compute,
+        FEED_CACHE_TIMEOUT,
+        version
+    )
+    if cached_version != version:
+        request.stale_page = True
+    return paginator.build_page(*cached)
+
+
+def page_etag(request, *args, **kwargs):
+    """
+    Валидатор страницы без обращения к базе за её данными: поколения
+    лент и подписок, пользователь, его CSRF-cookie и адрес со страницей.
+    """
+    key = ':'.join(str(part) for part in (
+        get_feed_version(),
+        get_follow_version(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.get_full_path(),
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def conditional_page(view):
+    """
+    Отвечает 304 Not Modified, если ETag клиента совпадает с page_etag,
+    до запроса страницы и отрисовки шаблонов. Страница зависит от
+    пользователя и каждый раз перепроверяется клиентом. Копия прошлого
+    поколения уходит без ETag: он описывал бы уже новые данные.
+    """
+    conditional_view = condition(etag_func=page_etag)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        if getattr(request, 'stale_page', False):
+            del response['ETag']
+        return response
+
+    return cache_control(private=True, no_cache=True)(wrapper)
@@ -1,6 +1,9 @@
-from django.forms import ModelForm, Select, Textarea
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import (CharField, Form, ModelChoiceField, ModelForm,
+                          Select, Textarea)
 
-from .models import Comment, Post
+from .images import process_upload
+from .models import Comment, Group, Post
 
 
 class PostForm(ModelForm):
@@ -24,6 +27,12 @@ class PostForm(ModelForm):
             'text': {'required': ('Недопустимая длина сообщения')}
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = process_upload(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -32,3 +41,20 @@ class CommentForm(ModelForm):
         labels = {
             'text': Textarea(attrs={'placeholder': 'Текст комментария'})
         }
+
+
+class SearchForm(Form):
+    q = CharField(
+        max_length=200,
+        label='Запрос'
+    )
+    group = ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Сообщество'
+    )
+    author = CharField(
+        max_length=150,
+        required=False,
+        label='Автор'
+    )
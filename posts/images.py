@@ -0,0 +1,201 @@
+import io
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+from yatube.profiling import timed_function
+
+from .settings import (IMAGE_ALLOWED_FORMATS, IMAGE_MAX_PIXELS,
+                       IMAGE_MAX_SIDE, IMAGE_UPLOAD_MAX_SIZE,
+                       IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_WIDTHS,
+                       THUMBNAIL_SIZE)
+from .storage import write_file
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+VARIANTS_DIR = 'posts/variants'
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+EXTENSIONS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+UPLOAD_QUALITY = 90
+
+EXIF_ORIENTATION = 0x0112
+
+
+def open_upload(upload):
+    if hasattr(upload, 'temporary_file_path'):
+        return Image.open(upload.temporary_file_path())
+    upload.seek(0)
+    return Image.open(upload)
+
+
+@timed_function('thumbnails')
+def process_upload(upload):
+    """
+    Проверяет загруженное изображение по заголовку файла и при
+    необходимости уменьшает его до IMAGE_MAX_SIDE, удаляя EXIF.
+    Возвращает исходный или перекодированный файл.
+    """
+    if upload.size > IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Размер файла не должен превышать %(size)s МБ',
+            code='file_too_large',
+            params={'size': IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)}
+        )
+    with open_upload(upload) as image:
+        image_format = image.format
+        if image_format not in IMAGE_ALLOWED_FORMATS:
+            raise ValidationError(
+                'Неподдерживаемый формат изображения',
+                code='invalid_format'
+            )
+        if image.width * image.height > IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большое разрешение изображения',
+                code='too_many_pixels'
+            )
+        oversized = max(image.size) > IMAGE_MAX_SIDE
+        if getattr(image, 'is_animated', False):
+            return upload
+        if not oversized and 'exif' not in image.info:
+            return upload
+        cap = (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE)
+        if image_format == 'JPEG':
+            image.draft('RGB', cap)
+        image.thumbnail(cap, Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = to_rgb(image)
+    processed = TemporaryUploadedFile(
+        upload.name, upload.content_type, 0, None
+    )
+    image.save(processed, image_format, quality=UPLOAD_QUALITY)
+    processed.size = processed.tell()
+    processed.seek(0)
+    upload.close()
+    return processed
+
+
+def get_variant_formats():
+    """Форматы вариантов от самого компактного к запасному JPEG"""
+    Image.init()
+    return [
+        image_format for image_format in ('AVIF', 'WEBP', 'JPEG')
+        if image_format in Image.SAVE
+    ]
+
+
+def get_variant_widths(source_width):
+    base_width = THUMBNAIL_SIZE[0]
+    return [
+        width for width in IMAGE_VARIANT_WIDTHS
+        if width <= max(source_width, base_width)
+    ]
+
+
+def encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=IMAGE_VARIANT_QUALITY[image_format],
+        optimize=image_format == 'JPEG',
+        progressive=image_format == 'JPEG'
+    )
+    return buffer.getvalue()
+
+
+def get_variant_name(stem, width, image_format):
+    return f'{VARIANTS_DIR}/{stem}_{width}.{EXTENSIONS[image_format]}'
+
+
+def get_variant_names(stem):
+    """
+    Имена всех возможных вариантов изображения с именем stem: варианты
+    пишутся ровно под этими именами, поэтому каталог не просматривается
+    """
+    return [
+        get_variant_name(stem, width, image_format)
+        for image_format in EXTENSIONS
+        for width in IMAGE_VARIANT_WIDTHS
+    ]
+
+
+def to_rgb(image):
+    """Изображение в RGB: прозрачные области заливаются белым"""
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image)
+    return image.convert('RGB')
+
+
+def get_oriented_width(image):
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return image.height
+    return image.width
+
+
+@timed_function('thumbnails')
+def build_variants(image_field):
+    """
+    Строит варианты изображения записи всех ширин и форматов с обрезкой
+    по пропорциям миниатюры. Уже существующие варианты того же файла
+    не пересоздаются. Возвращает поля записи с адресами вариантов.
+    """
+    stem = os.path.splitext(os.path.basename(image_field.name))[0]
+    base_width, base_height = THUMBNAIL_SIZE
+    source = None
+    sources = []
+    fields = {}
+    with image_field.open('rb') as source_file:
+        image = Image.open(source_file)
+        widths = get_variant_widths(get_oriented_width(image))
+        for image_format in get_variant_formats():
+            srcset = []
+            for width in widths:
+                height = round(width * base_height / base_width)
+                name = get_variant_name(stem, width, image_format)
+                if not default_storage.exists(name):
+                    if source is None:
+                        source = to_rgb(ImageOps.exif_transpose(image))
+                    variant = ImageOps.fit(
+                        source, (width, height), Image.LANCZOS
+                    )
+                    write_file(
+                        default_storage, name,
+                        ContentFile(encode(variant, image_format))
+                    )
+                url = default_storage.url(name)
+                srcset.append(f'{url} {width}w')
+                if image_format == 'JPEG' and width == base_width:
+                    fields.update(
+                        thumbnail_url=url,
+                        thumbnail_width=width,
+                        thumbnail_height=height
+                    )
+            if image_format == 'JPEG':
+                fields['thumbnail_srcset'] = ', '.join(srcset)
+            else:
+                sources.append([MIME_TYPES[image_format], ', '.join(srcset)])
+    fields['image_sources'] = json.dumps(sources)
+    return fields
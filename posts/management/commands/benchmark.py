@@ -0,0 +1,160 @@
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from posts.models import Follow, Group, Post, User
+
+ROUTES = ('index', 'group', 'profile', 'post', 'follow_index')
+
+
+def percentile(values, percent):
+    """Процентиль percent уже отсортированного списка values"""
+    if not values:
+        return 0
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает index, group_posts, profile, post_view и follow_index '
+        'через WSGI-приложение в несколько потоков и выводит '
+        'p50/p95/p99 задержки и число запросов в секунду'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--warmup', type=int, default=50,
+            help='Запросы для прогрева, не попадающие в отчёт'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.application = get_wsgi_application()
+        self.host = next(
+            (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+            'localhost'
+        ).lstrip('.')
+        targets = self.build_targets(options['requests'] + options['warmup'])
+        warmup = targets[:options['warmup']]
+        targets = targets[options['warmup']:]
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(self.request, warmup))
+            start = time.perf_counter()
+            results = list(executor.map(self.request, targets))
+            elapsed = time.perf_counter() - start
+        self.report(results, elapsed)
+
+    def build_targets(self, count):
+        posts = list(
+            Post.objects.order_by('?')
+            .values_list('author__username', 'id')[:100]
+        )
+        groups = list(
+            Group.objects.order_by('?').values_list('slug', flat=True)[:100]
+        )
+        readers = list(
+            User.objects
+            .filter(id__in=Follow.objects.values('user_id'))
+            .order_by('?')[:20]
+        )
+        if not posts or not groups or not readers:
+            raise CommandError(
+                'Нет данных для нагрузки: запустите generate_data'
+            )
+        cookies = [self.login(reader) for reader in readers]
+        targets = []
+        for number in range(count):
+            route = ROUTES[number % len(ROUTES)]
+            username, post_id = self.random.choice(posts)
+            cookie = ''
+            if route == 'group':
+                url = reverse(route, args=[self.random.choice(groups)])
+            elif route == 'profile':
+                url = reverse(route, args=[username])
+            elif route == 'post':
+                url = reverse(route, args=[username, post_id])
+            else:
+                url = reverse(route)
+            if route == 'follow_index':
+                cookie = self.random.choice(cookies)
+            targets.append((route, url, cookie))
+        return targets
+
+    def login(self, user):
+        engine = import_string(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def request(self, target):
+        route, url, cookie = target
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url,
+            'QUERY_STRING': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': cookie,
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+        start = time.perf_counter()
+        response = self.application(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return route, int(statuses[0].split()[0]), time.perf_counter() - start
+
+    def report(self, results, elapsed):
+        by_route = {route: [] for route in ROUTES}
+        errors = 0
+        for route, status, duration in results:
+            by_route[route].append(duration * 1000)
+            errors += status != 200
+        by_route['всего'] = [
+            duration * 1000 for _, _, duration in results
+        ]
+        self.stdout.write(
+            f'{"маршрут":<14}{"запросов":>10}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}'
+        )
+        for route, durations in by_route.items():
+            durations.sort()
+            self.stdout.write(
+                f'{route:<14}{len(durations):>10}'
+                f'{percentile(durations, 50):>10.1f}'
+                f'{percentile(durations, 95):>10.1f}'
+                f'{percentile(durations, 99):>10.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов в секунду: {len(results) / elapsed:.1f}, '
+            f'ошибок: {errors}'
+        ))
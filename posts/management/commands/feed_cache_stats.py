@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит число попаданий, промахов и выдач устаревших страниц '
+        'из кэша лент'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода'
+        )
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        total = sum(stats.values())
+        for event, count in stats.items():
+            share = count / total * 100 if total else 0
+            self.stdout.write(f'{event}: {count} ({share:.1f}%)')
+        if options['reset']:
+            reset_cache_stats()
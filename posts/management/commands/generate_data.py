@@ -0,0 +1,240 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from posts.cache import bump_feed_version
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import rebuild_index
+from posts.stats import rebuild_stats
+from posts.thumbnails import THUMBNAIL_FIELDS, generate_thumbnail
+from posts.timeline import rebuild_timelines
+
+WORDS = (
+    'котики собаки город река лес море горы дорога книга музыка кино '
+    'погода утро вечер друзья работа отпуск поезд кофе чай сад дом '
+    'снег дождь солнце осень весна лето зима фото прогулка новости'
+).split()
+
+IMAGES_COUNT = 8
+
+
+@contextmanager
+def explicit_dates(model, *names):
+    """Позволяет сохранить в полях auto_now и auto_now_add свои значения"""
+    fields = [model._meta.get_field(name) for name in names]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def power_law_weights(count, skew):
+    """Веса 1 / k**skew: немногие объекты получают большую часть выборок"""
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные: пользователей, сообщества, записи '
+        'с изображениями, комментарии и подписки со степенным '
+        'распределением популярности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.2,
+            help='Доля записей с изображением'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного распределения популярности авторов'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--prefix', default='user')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже существуют'
+            )
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            group_ids = self.create_groups(options['groups'])
+            weights = power_law_weights(len(user_ids), options['skew'])
+            post_ids = self.create_posts(
+                options['posts'], user_ids, group_ids, weights,
+                options['image_ratio'], options['days']
+            )
+            self.create_comments(options['comments'], user_ids, post_ids)
+            follows = self.create_follows(
+                options['follows'], user_ids, weights
+            )
+        self.stdout.write('Пересчёт статистики, лент и поискового индекса')
+        rebuild_stats()
+        rebuild_timelines()
+        rebuild_index()
+        self.build_thumbnails()
+        bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, '
+            f'сообществ {len(group_ids)}, записей {len(post_ids)}, '
+            f'комментариев {options["comments"]}, подписок {follows}'
+        ))
+
+    def create_users(self, count):
+        password = make_password(None)
+        User.objects.bulk_create(
+            (
+                User(username=f'{self.prefix}{number}', password=password)
+                for number in range(count)
+            )
+        )
+        return list(
+            User.objects
+            .filter(username__startswith=self.prefix)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def create_groups(self, count):
+        Group.objects.bulk_create(
+            Group(
+                title=f'Сообщество {self.prefix} {number}',
+                slug=f'{self.prefix}-group-{number}',
+                description=self.make_text(20)
+            )
+            for number in range(count)
+        )
+        return list(
+            Group.objects
+            .filter(slug__startswith=f'{self.prefix}-group-')
+            .values_list('id', flat=True)
+        )
+
+    def make_text(self, length):
+        return ' '.join(self.random.choices(WORDS, k=length)).capitalize()
+
+    def create_images(self):
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for number in range(IMAGES_COUNT):
+            image = Image.new('RGB', (1600, 900), self.random_color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(20):
+                x, y = self.random.randrange(1600), self.random.randrange(900)
+                size = self.random.randrange(50, 400)
+                draw.ellipse(
+                    (x, y, x + size, y + size), fill=self.random_color()
+                )
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            names.append(storage.save(
+                f'posts/{self.prefix}-{number}.jpg',
+                ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def random_color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def create_posts(self, count, user_ids, group_ids, weights,
+                     image_ratio, days):
+        images = self.create_images() if image_ratio else []
+        now = timezone.now()
+        authors = self.random.choices(user_ids, weights, k=count)
+        posts = []
+        for author_id in authors:
+            pub_date = now - timedelta(
+                seconds=self.random.randrange(days * 24 * 60 * 60)
+            )
+            posts.append(Post(
+                text=self.make_text(self.random.randint(5, 60)),
+                author_id=author_id,
+                group_id=(
+                    self.random.choice(group_ids)
+                    if group_ids and self.random.random() < 0.5 else None
+                ),
+                image=(
+                    self.random.choice(images)
+                    if images and self.random.random() < image_ratio else ''
+                ),
+                pub_date=pub_date,
+                updated=pub_date
+            ))
+        with explicit_dates(Post, 'pub_date', 'updated'):
+            Post.objects.bulk_create(posts)
+        return list(self.generated_posts().values_list('id', flat=True))
+
+    def generated_posts(self):
+        return Post.objects.filter(author__username__startswith=self.prefix)
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    post_id=self.random.choice(post_ids),
+                    author_id=self.random.choice(user_ids),
+                    text=self.make_text(self.random.randint(3, 15))
+                )
+                for _ in range(count)
+            )
+        )
+
+    def create_follows(self, count, user_ids, weights):
+        pairs = set()
+        authors = self.random.choices(
+            user_ids, cum_weights=list(accumulate(weights)), k=count * 3
+        )
+        for author_id in authors:
+            if len(pairs) == count:
+                break
+            user_id = self.random.choice(user_ids)
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs
+            )
+        )
+        return len(pairs)
+
+    def build_thumbnails(self):
+        names = (
+            self.generated_posts()
+            .exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        for name in list(names):
+            post = Post.objects.filter(image=name).first()
+            generate_thumbnail(post.id)
+            fields = (
+                Post.objects.filter(id=post.id)
+                .values(*THUMBNAIL_FIELDS).first()
+            )
+            Post.objects.filter(image=name).update(**fields)
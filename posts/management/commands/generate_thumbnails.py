@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры изображений записей'
+
+    def handle(self, *args, **options):
+        post_ids = (
+            Post.objects
+            .exclude(image='')
+            .exclude(image=None)
+            .filter(thumbnail_url='')
+            .values_list('id', flat=True)
+        )
+        count = 0
+        for post_id in post_ids.iterator():
+            generate_thumbnail(post_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано записей: {count}'
+        ))
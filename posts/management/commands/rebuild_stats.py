@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики подписчиков, подписок и записей'
+
+    def handle(self, *args, **options):
+        count = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитана статистика пользователей: {count}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import release_unused_images
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы изображений, на которые не ссылается ни одна запись'
+
+    def handle(self, *args, **options):
+        count = release_unused_images()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {count}'
+        ))
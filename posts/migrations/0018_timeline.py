@@ -0,0 +1,92 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:01
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.settings import (TIMELINE_BATCH_SIZE, TIMELINE_FANOUT_LIMIT,
+                            TIMELINE_LENGTH)
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    follows = (
+        Follow.objects
+        .order_by('author_id')
+        .values_list('author_id', 'user_id')
+    )
+    for author_id, group in groupby(follows.iterator(), itemgetter(0)):
+        user_ids = [user_id for _, user_id in group]
+        if len(user_ids) > TIMELINE_FANOUT_LIMIT:
+            continue
+        posts = list(
+            Post.objects
+            .filter(author_id=author_id)
+            .order_by('-pub_date')
+            .values_list('id', 'pub_date')[:TIMELINE_LENGTH]
+        )
+        for user_id in user_ids:
+            Timeline.objects.bulk_create(
+                (
+                    Timeline(user_id=user_id, post_id=post_id,
+                             pub_date=pub_date)
+                    for post_id, pub_date in posts
+                ),
+                batch_size=TIMELINE_BATCH_SIZE
+            )
+    user_ids = list(
+        Timeline.objects
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    for user_id in user_ids:
+        cutoff = (
+            Timeline.objects
+            .filter(user_id=user_id)
+            .order_by('-pub_date')
+            .values_list('pub_date', flat=True)[TIMELINE_LENGTH:]
+            .first()
+        )
+        if cutoff is not None:
+            Timeline.objects.filter(
+                user_id=user_id, pub_date__lte=cutoff
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_auto_20210414_2058'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Запись')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_stats(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    counters = [
+        ('followers_count', Follow.objects.values_list('author_id')),
+        ('following_count', Follow.objects.values_list('user_id')),
+        ('posts_count', Post.objects.values_list('author_id')),
+    ]
+    stats = {user_id: {} for user_id in User.objects.values_list('id',
+                                                                  flat=True)}
+    for field, values in counters:
+        values = values.order_by().annotate(count=Count('id'))
+        for user_id, count in values:
+            stats[user_id][field] = count
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id, **user_stats)
+        for user_id, user_stats in stats.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Адрес миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина миниатюры'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_sources',
+            field=models.TextField(blank=True, verbose_name='Варианты миниатюры в AVIF и WebP'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_srcset',
+            field=models.TextField(blank=True, verbose_name='Варианты миниатюры в JPEG'),
+        ),
+    ]
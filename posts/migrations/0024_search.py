@@ -0,0 +1,91 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:15
+
+import re
+import sqlite3
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fts5_supported(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE test USING fts5(body)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def fill_index(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    documents = {
+        post_id: (text, [])
+        for post_id, text in Post.objects.values_list('id', 'text')
+    }
+    for post_id, text in Comment.objects.values_list('post_id', 'text'):
+        documents[post_id][1].append(text)
+    if fts5_supported(schema_editor):
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_search '
+            "USING fts5(text, comments, tokenize='unicode61')"
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_search (rowid, text, comments) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (post_id, text, '\n'.join(comments))
+                    for post_id, (text, comments) in documents.items()
+                ]
+            )
+        return
+    terms = []
+    for post_id, (text, comments) in documents.items():
+        weights = Counter()
+        for term in re.findall(r'\w+', text.lower()):
+            weights[term] += 2
+        weights.update(re.findall(r'\w+', '\n'.join(comments).lower()))
+        terms.extend(
+            SearchTerm(term=term, post_id=post_id, weight=weight)
+            for term, weight in weights.items() if len(term) <= 64
+        )
+    SearchTerm.objects.bulk_create(terms)
+
+
+def drop_index(apps, schema_editor):
+    if fts5_supported(schema_editor):
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_image_hashed_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(fill_index, drop_index),
+    ]
@@ -1,7 +1,12 @@
+import json
 import textwrap
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .storage import hashed_storage
 
 User = get_user_model()
 
@@ -27,6 +32,24 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Записи вместе с автором, сообществом и числом комментариев"""
+        comments = (
+            Comment.objects
+            .filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return self.select_related('author', 'group').annotate(
+            comment_count=Coalesce(
+                Subquery(comments, output_field=IntegerField()), 0
+            )
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Содержимое заметки',
@@ -36,6 +59,10 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         db_index=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -52,9 +79,36 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=hashed_storage,
+        db_index=True,
         blank=True,
         null=True
     )
+    thumbnail_url = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Адрес миниатюры',
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Ширина миниатюры',
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Высота миниатюры',
+    )
+    thumbnail_srcset = models.TextField(
+        blank=True,
+        verbose_name='Варианты миниатюры в JPEG',
+    )
+    image_sources = models.TextField(
+        blank=True,
+        verbose_name='Варианты миниатюры в AVIF и WebP',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Запись'
@@ -62,6 +116,24 @@ class Post(models.Model):
         ordering = (
             '-pub_date',
         )
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+        ]
+
+    @property
+    def image_source_list(self):
+        """Пары (MIME-тип, srcset) для тегов <source> элемента <picture>"""
+        try:
+            return json.loads(self.image_sources or '[]')
+        except ValueError:
+            return []
 
     def __str__(self):
         formatted_text = textwrap.shorten(self.text, 15)
@@ -96,6 +168,17 @@ class Comment(models.Model):
         verbose_name='Дата комментария'
     )
 
+    class Meta:
+        ordering = (
+            'created',
+        )
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -118,3 +201,95 @@ class Follow(models.Model):
                 name='unique_object'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Записей'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(
+        max_length=64,
+        verbose_name='Слово'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Запись'
+    )
+    weight = models.PositiveIntegerField(
+        verbose_name='Вес'
+    )
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='unique_search_term'
+            ),
+        ]
@@ -0,0 +1,148 @@
+import base64
+import copy
+import json
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+from .settings import PAGE_POSTS_COUNT
+
+CURSOR_TYPES = (str, int, float, date)
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу сортировки (по умолчанию (pub_date, id)).
+    Соседние страницы адресуются непрозрачными курсорами ?after= и ?before=,
+    поэтому ни COUNT(*), ни OFFSET не выполняются.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        opts = self.object_list.model._meta
+        try:
+            values = [
+                self._to_python(opts, field.lstrip('-'), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if not all(isinstance(value, CURSOR_TYPES) for value in values):
+            return None
+        return values
+
+    @staticmethod
+    def _to_python(opts, name, value):
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _cursor_filter(self, values, forward, ordering=None):
+        query = Q()
+        equal = {}
+        for field, value in zip(ordering or self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') == forward else 'gt'
+            query |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return query
+
+    def _reversed_ordering(self, ordering=None):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in ordering or self.ordering
+        ]
+
+    def fetch(self, values, forward):
+        """
+        До per_page + 1 объектов за курсором values (или с начала, если
+        курсора нет) в порядке обхода: прямом при forward, иначе обратном
+        """
+        queryset = self.object_list
+        if values:
+            queryset = queryset.filter(self._cursor_filter(values, forward))
+        ordering = self.ordering if forward else self._reversed_ordering()
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def decode_cursors(self, after=None, before=None):
+        """
+        Значения курсоров (after, before), по которым строится страница:
+        before важнее after, неверный курсор заменяется на None
+        """
+        before_values = before and self.decode_cursor(before) or None
+        after_values = (
+            not before_values and after and self.decode_cursor(after) or None
+        )
+        return after_values, before_values
+
+    def get_page(self, after=None, before=None):
+        after_values, before_values = self.decode_cursors(after, before)
+        if before_values:
+            rows = self.fetch(before_values, forward=False)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            rows = self.fetch(after_values, forward=True)
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after_values)
+        return self.build_page(
+            rows,
+            self.encode_cursor(rows[0]) if has_previous and rows else None,
+            self.encode_cursor(rows[-1]) if has_next and rows else None,
+        )
+
+    def build_page(self, rows, previous_cursor, next_cursor):
+        """
+        Страница с курсорами соседних страниц. Номер страницы 1 или 2,
+        а count у копии пагинатора считается по самой странице: так
+        has_previous(), has_next() и end_index() отвечают по курсорам
+        и не выполняют COUNT(*).
+        """
+        number = 2 if previous_cursor else 1
+        paginator = copy.copy(self)
+        paginator.count = (
+            (number - 1) * self.per_page + len(rows) + bool(next_cursor)
+        )
+        page = Page(rows, number, paginator)
+        page.previous_cursor = previous_cursor
+        page.next_cursor = next_cursor
+        return page
+
+
+def get_page(request, posts, per_page=PAGE_POSTS_COUNT,
+             ordering=('-pub_date', '-id')):
+    return paginate(request, CursorPaginator(posts, per_page, ordering))
+
+
+def paginate(request, paginator):
+    """Страница paginator по курсорам ?after= и ?before= запроса"""
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
@@ -0,0 +1,242 @@
+import re
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import (Count, FloatField, IntegerField, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.expressions import Expression
+
+from .models import Comment, Post, SearchTerm
+from .settings import SEARCH_TEXT_WEIGHT
+
+FTS_TABLE = 'posts_search'
+
+TERM_MAX_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+
+def tokenize(text):
+    return [
+        term for term in re.findall(r'\w+', text.lower())
+        if len(term) <= TERM_MAX_LENGTH
+    ]
+
+
+@lru_cache(maxsize=None)
+def fts5_supported():
+    """Собран ли SQLite с модулем полнотекстового поиска FTS5"""
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE test USING fts5(body)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def use_fts():
+    return connection.vendor == 'sqlite' and fts5_supported()
+
+
+class FullTextMatch(Expression):
+    """
+    Номера записей, найденных в таблице FTS5 по запросу, для pk__in.
+    SQL без внешних скобок: их добавляет сам поиск __in.
+    """
+    output_field = IntegerField()
+
+    def __init__(self, match):
+        super().__init__()
+        self.match = match
+
+    def as_sql(self, compiler, connection):
+        return (
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (self.match,)
+        )
+
+
+class FullTextRank(Expression):
+    """
+    Оценка bm25 записи по запросу: чем меньше, тем релевантнее. Считается
+    по таблице FTS5, которую search_posts присоединяет к запросу.
+    """
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection):
+        return (
+            f'bm25({FTS_TABLE}, %s, 1.0)', (float(SEARCH_TEXT_WEIGHT),)
+        )
+
+
+def get_documents(post_ids=None):
+    """Тексты записей и их комментариев: {id записи: (текст, комментарии)}"""
+    posts = Post.objects.order_by()
+    comments = Comment.objects.order_by('post_id', 'id')
+    if post_ids is not None:
+        posts = posts.filter(id__in=post_ids)
+        comments = comments.filter(post_id__in=post_ids)
+    documents = {
+        post_id: (text, [])
+        for post_id, text in posts.values_list('id', 'text').iterator()
+    }
+    for post_id, text in comments.values_list('post_id', 'text').iterator():
+        if post_id in documents:
+            documents[post_id][1].append(text)
+    return {
+        post_id: (text, '\n'.join(comment_texts))
+        for post_id, (text, comment_texts) in documents.items()
+    }
+
+
+def build_terms(post_id, text, comments):
+    weights = Counter()
+    for term in tokenize(text):
+        weights[term] += SEARCH_TEXT_WEIGHT
+    weights.update(tokenize(comments))
+    return [
+        SearchTerm(term=term, post_id=post_id, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+def remove_posts(post_ids):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids]
+            )
+    else:
+        SearchTerm.objects.filter(post_id__in=post_ids).delete()
+
+
+@transaction.atomic
+def index_posts(post_ids):
+    """Заново индексирует записи post_ids вместе с комментариями"""
+    documents = get_documents(post_ids)
+    remove_posts(post_ids)
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (post_id, text, comments)
+                    for post_id, (text, comments) in documents.items()
+                ]
+            )
+    else:
+        SearchTerm.objects.bulk_create(
+            [
+                term
+                for post_id, (text, comments) in documents.items()
+                for term in build_terms(post_id, text, comments)
+            ]
+        )
+
+
+@transaction.atomic
+def index_comment(comment):
+    """
+    Дописывает в индекс записи текст нового комментария, не перечитывая
+    остальные комментарии. Если записи ещё нет в таблице FTS5,
+    индексирует её целиком.
+    """
+    if not use_fts():
+        weights = Counter(tokenize(comment.text))
+        terms = SearchTerm.objects.filter(
+            post_id=comment.post_id, term__in=list(weights)
+        )
+        for term in terms:
+            term.weight += weights.pop(term.term)
+            term.save(update_fields=['weight'])
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=comment.post_id, weight=weight)
+            for term, weight in weights.items()
+        )
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET comments = CASE '
+            "WHEN comments = '' THEN %s "
+            'ELSE comments || char(10) || %s END WHERE rowid = %s',
+            (comment.text, comment.text, comment.post_id)
+        )
+        if cursor.rowcount:
+            return
+    index_posts([comment.post_id])
+
+
+@transaction.atomic
+def rebuild_index():
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    else:
+        SearchTerm.objects.all().delete()
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    index_posts(post_ids)
+    return len(post_ids)
+
+
+def get_matches(terms):
+    """Номера записей, содержащих все слова terms, со суммой весов score"""
+    return (
+        SearchTerm.objects
+        .filter(term__in=terms)
+        .order_by()
+        .values('post_id')
+        .annotate(found=Count('term'), score=Sum('weight'))
+        .filter(found=len(terms))
+    )
+
+
+def get_match(terms):
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def match_posts(posts, query):
+    """
+    Записи из posts, содержащие все слова запроса, без оценки
+    релевантности: для выборок со своей сортировкой, например в админке.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return posts.none()
+    if use_fts():
+        return posts.filter(pk__in=FullTextMatch(get_match(terms)))
+    return posts.filter(id__in=get_matches(terms).values('post_id'))
+
+
+def search_posts(posts, query):
+    """
+    Записи из posts, содержащие все слова запроса, с релевантностью rank:
+    чем меньше значение, тем выше запись в выдаче. Таблица FTS5
+    присоединяется к записям, так что MATCH и bm25 выполняются за один
+    проход по найденным строкам.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return posts.none().annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+    if use_fts():
+        table = posts.model._meta.db_table
+        return posts.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE} MATCH %s',
+                f'{FTS_TABLE}.rowid = "{table}"."id"',
+            ],
+            params=[get_match(terms)]
+        ).annotate(rank=FullTextRank())
+    matches = get_matches(terms)
+    score = Subquery(
+        matches.filter(post_id=OuterRef('pk')).values('score'),
+        output_field=FloatField()
+    )
+    return posts.filter(
+        id__in=matches.values('post_id')
+    ).annotate(rank=Value(0.0, output_field=FloatField()) - score)
@@ -2,3 +2,108 @@
 Количество записей на странице, с использованием паджинатора
 """
 PAGE_POSTS_COUNT = 10
+
+"""
+Максимальное количество записей в материализованной ленте подписок
+"""
+TIMELINE_LENGTH = 500
+
+"""
+Количество подписчиков, начиная с которого записи автора не рассылаются
+по лентам при публикации, а подмешиваются в ленту при чтении
+"""
+TIMELINE_FANOUT_LIMIT = 1000
+
+"""
+Число строк ленты в одном INSERT: 300 строк по три поля укладываются
+в ограничение SQLite на 999 параметров запроса
+"""
+TIMELINE_BATCH_SIZE = 300
+
+"""
+Время хранения страниц ленты в кэше, сек. Страницы сбрасываются при любом
+изменении записей и комментариев, таймаут лишь ограничивает размер кэша
+"""
+FEED_CACHE_TIMEOUT = 60 * 5
+
+"""
+Сколько секунд один воркер держит блокировку пересчёта страницы ленты,
+и с каким интервалом остальные воркеры проверяют, готова ли страница
+"""
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_LOCK_POLL = 0.05
+
+"""
+Сколько секунд после устаревания страница ленты ещё отдаётся из кэша,
+пока один воркер пересчитывает её
+"""
+FEED_CACHE_STALE_TIMEOUT = 60
+
+"""
+На сколько поколений кэша лент может отстать устаревшая страница,
+которую отдают во время пересчёта
+"""
+FEED_CACHE_STALE_GENERATIONS = 1
+
+"""
+Счётчики попаданий и промахов кэша лент копятся в процессе и сбрасываются
+в общий кэш каждые FEED_CACHE_STATS_BATCH событий или раз в
+FEED_CACHE_STATS_INTERVAL секунд
+"""
+FEED_CACHE_STATS_BATCH = 100
+FEED_CACHE_STATS_INTERVAL = 10
+
+"""
+Параметры миниатюры изображения записи и число фоновых потоков,
+которые строят миниатюры после сохранения записи
+"""
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_WORKERS = 2
+
+"""
+Ширины вариантов изображения записи для srcset. Варианты шире исходного
+изображения, кроме базовой ширины миниатюры, не строятся
+"""
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_QUALITY = {'AVIF': 60, 'WEBP': 80, 'JPEG': 85}
+
+"""
+Ограничения загружаемых изображений: размер файла в байтах, число
+пикселей, допустимые форматы. Изображения, у которых большая сторона
+длиннее IMAGE_MAX_SIDE, уменьшаются перед сохранением
+"""
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIDE = 2560
+IMAGE_ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+"""
+Сколько секунд после загрузки файл изображения не удаляется, даже если
+на него ещё нет ссылок: запись с ним может быть не сохранена
+"""
+IMAGE_RELEASE_GRACE = 120
+
+"""
+Вес слов из текста записи в поисковом индексе относительно слов
+из комментариев к ней
+"""
+SEARCH_TEXT_WEIGHT = 2
+
+"""
+Сколько строк не больше считает админка, чтобы показать число страниц
+"""
+ADMIN_COUNT_LIMIT = 10000
+
+"""
+Сколько комментариев показывается на странице записи и подгружается
+за раз кнопкой «Показать ещё»
+"""
+COMMENTS_PAGE_SIZE = 20
+
+"""
+Со скольких комментариев страница записи со всеми комментариями
+(?comments=all) отдаётся потоком: начало
+страницы уходит сразу, комментарии — частями по COMMENTS_CHUNK_SIZE
+"""
+COMMENTS_STREAM_THRESHOLD = 200
+COMMENTS_CHUNK_SIZE = 100
@@ -0,0 +1,93 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, timeline
+from .cache import bump_feed_version, bump_follow_version
+from .models import Comment, Follow, Group, Post, User
+from .stats import change_stats
+from .thumbnails import schedule_release
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        change_stats(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_stats(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    schedule_release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, update_fields=None, **kwargs):
+    """Имя автора есть на страницах лент, а вход меняет только last_login"""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_feed_version()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_post(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        change_stats(instance.author_id, 'followers_count', 1)
+        change_stats(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    change_stats(instance.author_id, 'followers_count', -1)
+    change_stats(instance.user_id, 'following_count', -1)
+    timeline.purge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follows(sender, **kwargs):
+    bump_follow_version()
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    if created:
+        search.index_comment(instance)
+    else:
+        search.index_posts([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def index_commented_post(sender, instance, **kwargs):
+    search.index_posts([instance.post_id])
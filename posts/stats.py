@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Follow, Post, User, UserStats
+
+
+def count_stats(user_ids=None):
+    """Счётчики подписчиков, подписок и записей, посчитанные по таблицам"""
+    follows = Follow.objects.order_by()
+    posts = Post.objects.order_by()
+    if user_ids is not None:
+        follows = follows.filter(author_id__in=user_ids) | follows.filter(
+            user_id__in=user_ids
+        )
+        posts = posts.filter(author_id__in=user_ids)
+    counters = [
+        ('followers_count', follows.values_list('author_id')),
+        ('following_count', follows.values_list('user_id')),
+        ('posts_count', posts.values_list('author_id')),
+    ]
+    stats = {}
+    for field, values in counters:
+        for user_id, count in values.annotate(count=Count('id')):
+            stats.setdefault(user_id, {})[field] = count
+    if user_ids is not None:
+        stats = {
+            user_id: stats.get(user_id, {}) for user_id in user_ids
+        }
+    return stats
+
+
+def refresh_stats(user_id):
+    UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'followers_count': 0,
+            'following_count': 0,
+            'posts_count': 0,
+            **count_stats([user_id])[user_id],
+        }
+    )
+
+
+def change_stats(user_id, field, delta):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        refresh_stats(user_id)
+
+
+@transaction.atomic
+def rebuild_stats():
+    stats = count_stats()
+    UserStats.objects.all().delete()
+    return len(UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id, **stats.get(user_id, {}))
+            for user_id in User.objects.values_list('id', flat=True)
+        ]
+    ))
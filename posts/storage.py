@@ -0,0 +1,85 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+
+from .settings import IMAGE_RELEASE_GRACE
+
+
+def write_file(storage, name, content):
+    """
+    Записывает файл хранилища ровно под именем name: сначала во временный
+    файл рядом, затем os.replace. Одновременные записи того же содержимого
+    не порождают копий с суффиксами, а читатель не видит файл недописанным.
+    """
+    path = storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                temp_file.write(chunk)
+        os.chmod(temp_path, storage.file_permissions_mode or 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return name
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — SHA-256 его содержимого. Одинаковые
+    загрузки указывают на один и тот же файл, повторно он не записывается,
+    а только получает новое время изменения — это защищает его от
+    удаления в delete_unused, пока запись с ним ещё не сохранена.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest.hexdigest() + extension
+        )
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            write_file(self, name, content)
+        return name
+
+    def delete_unused(self, name, is_used):
+        """
+        Удаляет файл, если is_used() ложно и файл не сохраняли последние
+        IMAGE_RELEASE_GRACE секунд. Файл сначала атомарно убирается
+        под другое имя: одновременная загрузка того же содержимого либо
+        успела обновить его время изменения и файл вернётся на место,
+        либо уже не найдёт его и запишет заново. Возвращает, удалён ли
+        файл окончательно.
+        """
+        path = self.path(name)
+        released = f'{path}.released'
+        try:
+            os.replace(path, released)
+        except FileNotFoundError:
+            return False
+        if (
+            is_used()
+            or time.time() - os.stat(released).st_mtime < IMAGE_RELEASE_GRACE
+        ):
+            os.replace(released, path)
+            return False
+        os.remove(released)
+        return not os.path.exists(path)
+
+
+hashed_storage = HashedMediaStorage()
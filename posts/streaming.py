@@ -0,0 +1,42 @@
+import uuid
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from .settings import COMMENTS_CHUNK_SIZE
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_comments(request, template_name, context):
+    """
+    Отдаёт страницу потоком: всё до комментариев уходит клиенту сразу,
+    затем комментарии читаются из базы итератором и отрисовываются
+    частями по COMMENTS_CHUNK_SIZE, и в конце — остаток страницы.
+    """
+    marker = f'<!-- comments:{uuid.uuid4().hex} -->'
+    page = render_to_string(
+        template_name,
+        {**context, 'comments_marker': mark_safe(marker)},
+        request
+    )
+    head, tail = page.split(marker, 1)
+    comment_list = get_template('include/comment_list.html')
+    comments = context['comments'].iterator(chunk_size=COMMENTS_CHUNK_SIZE)
+
+    def content():
+        yield head
+        for chunk in iter_chunks(comments, COMMENTS_CHUNK_SIZE):
+            yield comment_list.render({'comments': chunk})
+        yield tail
+
+    return StreamingHttpResponse(content())
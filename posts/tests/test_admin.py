@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.admin import PostAdmin
+from posts.models import Comment, Follow, Group, Post, User
+
+ADMIN_USERNAME = 'admin'
+AUTHOR_USERNAME = 'Andrey'
+
+POST_CHANGELIST = reverse('admin:posts_post_changelist')
+COMMENT_CHANGELIST = reverse('admin:posts_comment_changelist')
+FOLLOW_CHANGELIST = reverse('admin:posts_follow_changelist')
+GROUP_CHANGELIST = reverse('admin:posts_group_changelist')
+
+
+class AdminSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            ADMIN_USERNAME, 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Котики и собаки', author=cls.author, group=cls.group
+        )
+        cls.other_post = Post.objects.create(
+            text='Про птиц', author=cls.author
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Котики милые'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Собаки тоже'
+        )
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get_results(self, url, query):
+        response = self.client.get(url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_post_search_uses_index(self):
+        """Поиск записей в админке идёт по поисковому индексу"""
+        with CaptureQueriesContext(connection) as queries:
+            results = self.get_results(POST_CHANGELIST, 'котики')
+        self.assertEqual(results, [self.post])
+        self.assertFalse(
+            [query for query in queries if 'LIKE' in query['sql']]
+        )
+
+    def test_search_does_not_rank_results(self):
+        """Админка сортирует по дате и не считает релевантность записей"""
+        for url in (POST_CHANGELIST, COMMENT_CHANGELIST):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.get_results(url, 'котики')
+                self.assertFalse(
+                    [query for query in queries if 'bm25' in query['sql']]
+                )
+
+    def test_comment_search(self):
+        """Комментарии ищутся по тексту и по точному имени автора"""
+        self.assertEqual(
+            self.get_results(COMMENT_CHANGELIST, 'котики'), [self.comment]
+        )
+        self.assertEqual(
+            len(self.get_results(COMMENT_CHANGELIST, ADMIN_USERNAME)), 2
+        )
+
+    def test_follow_and_group_search(self):
+        """Подписки ищутся по имени пользователя, сообщества по названию"""
+        self.assertEqual(
+            len(self.get_results(FOLLOW_CHANGELIST, AUTHOR_USERNAME)), 1
+        )
+        self.assertEqual(
+            self.get_results(GROUP_CHANGELIST, 'Тестовое'), [self.group]
+        )
+
+    def test_changelists_skip_full_count(self):
+        """Списки больших таблиц не считают строки без ограничения"""
+        for url in (POST_CHANGELIST, COMMENT_CHANGELIST, FOLLOW_CHANGELIST):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                counts = [
+                    query['sql'] for query in queries
+                    if 'COUNT(' in query['sql']
+                ]
+                self.assertTrue(counts)
+                for sql in counts:
+                    self.assertIn('LIMIT', sql)
+
+    def test_far_pages_beyond_count_limit(self):
+        """Страницы дальше ADMIN_COUNT_LIMIT открываются по номеру"""
+        Post.objects.bulk_create(
+            Post(text=f'Запись {i}', author=self.author) for i in range(5)
+        )
+        with mock.patch('posts.admin.ADMIN_COUNT_LIMIT', 2), \
+                mock.patch.object(PostAdmin, 'list_per_page', 1):
+            response = self.client.get(POST_CHANGELIST, {'p': 5})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['cl'].result_list), 1)
+            response = self.client.get(POST_CHANGELIST, {'p': 50})
+        self.assertEqual(response.status_code, 302)
+
+    def test_comment_search_uses_indexes(self):
+        """Поиск комментариев не просматривает всю таблицу комментариев"""
+        with CaptureQueriesContext(connection) as queries:
+            self.get_results(COMMENT_CHANGELIST, 'котики')
+        sql = next(
+            query['sql'] for query in queries
+            if 'posts_comment' in query['sql'] and 'COUNT(' not in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertNotIn('SCAN posts_comment', plan)
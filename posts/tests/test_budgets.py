@@ -0,0 +1,204 @@
+import json
+import os
+import platform
+import time
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase
+from django.urls import URLPattern, resolve, reverse
+
+from about import urls as about_urls
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR_USERNAME = 'Andrey'
+OTHER_USERNAME = 'Petr'
+
+GROUP_SLUG = 'test-slug'
+
+POSTS_COUNT = 25
+COMMENTS_PER_POST = 3
+
+# Путь к отчёту о маршрутах; без переменной окружения отчёт не пишется
+BUDGET_REPORT = os.environ.get('BUDGET_REPORT')
+
+"""
+Бюджеты маршрутов: наибольшее число SQL-запросов и время ответа в мс.
+Страницы запрашиваются с пустым кэшем, то есть в худшем случае.
+"""
+BUDGETS = {
+    'group': (4, 500),
+    'new_post': (5, 500),
+    'follow_index': (5, 500),
+    'search': (4, 500),
+    'profile': (5, 500),
+    'post': (4, 500),
+    'post_comments': (4, 500),
+    'post_edit': (4, 500),
+    'add_comment': (3, 500),
+    'profile_follow': (6, 500),
+    'profile_unfollow': (11, 500),
+    'page_not_found': (3, 500),
+    'server_error': (3, 500),
+    'index': (3, 500),
+    'about:author': (2, 500),
+    'about:tech': (2, 500),
+}
+
+QUERY_PARAMS = {
+    'search': {'q': 'запись'},
+}
+
+"""
+Обработчики ошибок: их адреса перекрывает маршрут профиля, поэтому
+они вызываются напрямую с нужными аргументами и ожидаемым статусом
+"""
+HANDLERS = {
+    'page_not_found': ({'exception': Http404()}, 404),
+    'server_error': ({}, 500),
+}
+
+ROUTE_SOURCES = [
+    ('', posts_urls.urlpatterns),
+    ('about:', about_urls.urlpatterns),
+]
+
+
+def get_routes():
+    """Имена всех именованных маршрутов posts.urls и about.urls"""
+    return [
+        (prefix + pattern.name, pattern)
+        for prefix, patterns in ROUTE_SOURCES
+        for pattern in patterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    ]
+
+
+class QueryTimer:
+    """Обёртка выполнения запросов, считающая их число и время"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class RouteBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.other = User.objects.create(username=OTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=GROUP_SLUG
+        )
+        Follow.objects.create(user=cls.author, author=cls.other)
+        for number in range(POSTS_COUNT):
+            post = Post.objects.create(
+                text=f'Тестовая запись {number}',
+                author=(cls.author, cls.other)[number % 2],
+                group=cls.group if number % 3 else None
+            )
+            for comment_number in range(COMMENTS_PER_POST):
+                Comment.objects.create(
+                    post=post,
+                    author=(cls.other, cls.author)[comment_number % 2],
+                    text=f'Комментарий {comment_number}'
+                )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        cls.route_kwargs = {
+            'slug': GROUP_SLUG,
+            'post_id': cls.post.id,
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get_url(self, name, pattern):
+        kwargs = {
+            key: self.route_kwargs.get(key)
+            for key in pattern.pattern.converters
+        }
+        if 'username' in kwargs:
+            kwargs['username'] = (
+                AUTHOR_USERNAME if 'post_id' in kwargs else OTHER_USERNAME
+            )
+        return reverse(name, kwargs=kwargs)
+
+    def get_response(self, name, pattern, url):
+        if name in HANDLERS:
+            kwargs, _ = HANDLERS[name]
+            request = RequestFactory().get(url)
+            request.user = self.author
+            return pattern.callback(request, **kwargs)
+        self.assertEqual(
+            resolve(url).url_name, pattern.name,
+            'Адрес маршрута перекрыт другим маршрутом'
+        )
+        return self.client.get(url, QUERY_PARAMS.get(name))
+
+    def measure(self, name, pattern):
+        url = self.get_url(name, pattern)
+        cache.clear()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            start = time.perf_counter()
+            response = self.get_response(name, pattern, url)
+            total_time = (time.perf_counter() - start) * 1000
+        sql_time = timer.time * 1000
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': timer.count,
+            'sql_time_ms': round(sql_time, 3),
+            'render_time_ms': round(total_time - sql_time, 3),
+            'total_time_ms': round(total_time, 3),
+        }
+
+    def write_report(self, results):
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'dataset': {
+                'posts': POSTS_COUNT,
+                'comments_per_post': COMMENTS_PER_POST,
+            },
+            'routes': results,
+        }
+        with open(BUDGET_REPORT, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+
+    def test_routes_fit_budgets(self):
+        """Каждый маршрут укладывается в бюджет запросов и времени"""
+        results = {}
+        for name, pattern in get_routes():
+            with self.subTest(route=name):
+                self.assertIn(name, BUDGETS, 'У маршрута нет бюджета')
+                max_queries, max_time = BUDGETS[name]
+                result = self.measure(name, pattern)
+                result['budget'] = {
+                    'queries': max_queries,
+                    'total_time_ms': max_time,
+                }
+                results[name] = result
+                if name in HANDLERS:
+                    self.assertEqual(result['status'], HANDLERS[name][1])
+                else:
+                    self.assertLess(result['status'], 500)
+                self.assertLessEqual(result['queries'], max_queries)
+                self.assertLessEqual(result['total_time_ms'], max_time)
+        if BUDGET_REPORT:
+            self.write_report(results)
@@ -1,8 +1,21 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post, User
+from posts.cache import (bump_feed_version, get_cache_stats,
+                         get_feed_version, get_or_compute, make_page_key,
+                         reset_cache_stats)
+from posts.models import Comment, Follow, Group, Post, User
+from yatube.cache import SQLiteCache
 
 AUTHOR_USERNAME = 'Andrey'
 AUTHOR_PASSWORD = 'qwerty'
@@ -31,26 +44,313 @@ class CacheTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.author_client = Client()
         self.author_client.force_login(self.user_author)
 
-    def test_new_post_creates_new_post(self):
-        """Главная страница кэширует отображаемую информацию на 20 сек"""
-        response_index_before_adding_post = self.guest_client.get(INDEX_URL)
+    def get_post_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(INDEX_URL)
+        return [
+            query for query in queries
+            if query['sql'].startswith('SELECT "posts_post"."id"')
+        ]
+
+    def test_index_page_is_shared_between_users(self):
+        """Страница ленты кэшируется одна для всех пользователей"""
+        self.assertTrue(self.get_post_queries(self.guest_client))
+        self.assertFalse(self.get_post_queries(self.guest_client))
+        self.assertFalse(self.get_post_queries(self.author_client))
+
+    def test_invalid_cursors_share_first_page(self):
+        """Неверные курсоры не порождают новых записей в кэше: страница
+        берётся из кэша первой страницы"""
+        self.assertTrue(self.get_post_queries(self.guest_client))
+        for params in ({'after': 'garbage'}, {'before': 'W10=', 'x': 1}):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(INDEX_URL, params)
+                self.assertFalse([
+                    query for query in queries
+                    if query['sql'].startswith('SELECT "posts_post"."id"')
+                ])
+
+    def test_new_post_invalidates_index_page(self):
+        """Новая запись сразу появляется на главной странице"""
+        self.guest_client.get(INDEX_URL)
         Post.objects.create(
             text='Тестовая заметка 2',
             author=self.user_author,
             group=self.group
         )
-        response_index_after_adding_post = self.guest_client.get(INDEX_URL)
-        self.assertEqual(
-            response_index_before_adding_post.content,
-            response_index_after_adding_post.content
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'Тестовая заметка 2')
+
+    def test_new_comment_invalidates_index_page(self):
+        """Новый комментарий сразу меняет страницу ленты"""
+        self.guest_client.get(INDEX_URL)
+        Comment.objects.create(
+            post=self.post,
+            author=self.user_author,
+            text='Комментарий'
+        )
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_renamed_author_invalidates_index_page(self):
+        """Новое имя автора сразу появляется на главной странице"""
+        self.guest_client.get(INDEX_URL)
+        self.user_author.username = 'Renamed'
+        self.user_author.save()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, '@Renamed')
+
+    def test_deleted_group_invalidates_index_page(self):
+        """Удалённое сообщество сразу пропадает с главной страницы"""
+        self.guest_client.get(INDEX_URL)
+        Group.objects.get(pk=self.group.pk).delete()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertNotContains(response, self.group.title)
+
+    def test_login_keeps_index_page(self):
+        """Вход пользователя не сбрасывает кэш страниц"""
+        version = get_feed_version()
+        self.client.force_login(self.user_author)
+        self.assertEqual(get_feed_version(), version)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=GROUP_SLUG
+        )
+        cls.post = Post.objects.create(
+            text='Тестируем тестовую заметку',
+            author=cls.user_author,
+            group=cls.group
+        )
+        cls.urls = (
+            INDEX_URL,
+            reverse('group', args=[GROUP_SLUG]),
+            reverse('profile', args=[AUTHOR_USERNAME]),
+            reverse('post', args=[AUTHOR_USERNAME, cls.post.id]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_unchanged_page_is_not_modified(self):
+        """Неизменённая страница отдаётся ответом 304 без её запросов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                etag = self.client.get(url)['ETag']
+                response, queries = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.content)
+                self.assertFalse([
+                    query for query in queries
+                    if 'posts_' in query['sql']
+                ])
+
+    def test_pages_are_private_and_revalidated(self):
+        """Страница зависит от пользователя и всегда перепроверяется"""
+        response = self.client.get(INDEX_URL)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        guest_etag = Client().get(INDEX_URL)['ETag']
+        self.assertNotEqual(response['ETag'], guest_etag)
+
+    def test_stale_page_has_no_etag(self):
+        """Копия прошлого поколения отдаётся без ETag нового поколения"""
+        self.client.get(INDEX_URL)
+        bump_feed_version()
+        lock_key = make_page_key('index', None, None) + ':lock'
+        cache.add(lock_key, 1, version=get_feed_version())
+        response = self.client.get(INDEX_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_changes_invalidate_etag(self):
+        """Новый комментарий и подписка меняют ETag страниц"""
+        changes = (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+            lambda: Follow.objects.create(
+                user=self.reader, author=self.user_author
+            ),
+        )
+        for url in self.urls:
+            for change in changes:
+                with self.subTest(url=url, change=change):
+                    self.client.get(url)
+                    etag = self.client.get(url)['ETag']
+                    change()
+                    response, _ = self.revalidate(url, etag)
+                    self.assertEqual(response.status_code, 200)
+                    Follow.objects.all().delete()
+
+
+class PostFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create(
+            username=AUTHOR_USERNAME,
+            password=AUTHOR_PASSWORD
+        )
+        cls.post = Post.objects.create(
+            text='Тестируем тестовую заметку',
+            author=cls.user_author
+        )
+        cls.POST_EDIT_URL = reverse(
+            'post_edit',
+            kwargs={'username': AUTHOR_USERNAME, 'post_id': cls.post.id}
         )
+
+    def setUp(self):
         cache.clear()
-        response_index_after_cache_clear = self.guest_client.get(INDEX_URL)
-        self.assertNotEqual(
-            response_index_after_adding_post.content,
-            response_index_after_cache_clear.content
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def test_post_fragment_is_reused_until_post_changes(self):
+        """Разметка записи берётся из кэша, пока запись не изменится"""
+        self.guest_client.get(INDEX_URL)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        bump_feed_version()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, self.post.text)
+        self.author_client.post(
+            self.POST_EDIT_URL,
+            data={'text': 'Отредактированная заметка'}
         )
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'Отредактированная заметка')
+
+    def test_post_fragment_follows_author_and_group(self):
+        """Переименование автора или сообщества обновляет разметку записи"""
+        group = Group.objects.create(title='Старое название', slug=GROUP_SLUG)
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        self.guest_client.get(INDEX_URL)
+        User.objects.filter(pk=self.user_author.pk).update(username='Renamed')
+        Group.objects.filter(pk=group.pk).update(title='Новое название')
+        bump_feed_version()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, '@Renamed')
+        self.assertContains(response, '#Новое название')
+
+    def test_user_buttons_are_not_cached(self):
+        """Кнопки пользователя не попадают в кэш разметки записи"""
+        self.guest_client.get(INDEX_URL)
+        response = self.author_client.get(INDEX_URL)
+        self.assertContains(response, 'Редактировать')
+        response = self.guest_client.get(INDEX_URL)
+        self.assertNotContains(response, 'Редактировать')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_are_shared_between_instances(self):
+        """Значения видны всем экземплярам кэша с тем же файлом"""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(SQLiteCache(self.path, {}).get('key'), {'value': 1})
+
+    def test_add_incr_and_delete(self):
+        """add не перезаписывает значение, incr и delete работают атомарно"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.cache.delete('counter')
+        self.assertIsNone(self.cache.get('counter'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+
+    def test_expired_values_are_missing(self):
+        """Просроченные значения не возвращаются"""
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new value'))
+
+    def test_versions_do_not_collide(self):
+        """Одинаковые ключи разных версий хранятся раздельно"""
+        self.cache.set('key', 'first', version=1)
+        self.cache.set('key', 'second', version=2)
+        self.assertEqual(self.cache.get('key', version=1), 'first')
+        self.assertEqual(self.cache.get('key', version=2), 'second')
+
+
+class StampedeProtectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.compute = mock.Mock(return_value='fresh')
+
+    def test_lock_owner_computes_once(self):
+        """Промах кэша пересчитывается и сохраняется один раз"""
+        self.assertEqual(get_or_compute('page', self.compute, 60, 1), 'fresh')
+        self.assertEqual(get_or_compute('page', self.compute, 60, 1), 'fresh')
+        self.compute.assert_called_once()
+        self.assertIsNone(cache.get('page:lock', version=1))
+        self.assertEqual(get_cache_stats(), {'hit': 1, 'miss': 1, 'stale': 0})
+
+    def test_stale_value_is_served_during_recompute(self):
+        """Пока другой воркер пересчитывает страницу, отдаётся старая копия"""
+        get_or_compute('page', lambda: 'old', 0, 1)
+        cache.add('page:lock', 1, version=1)
+        cache.add('page:lock', 1, version=2)
+        self.assertEqual(get_or_compute('page', self.compute, 60, 1), 'old')
+        self.assertEqual(get_or_compute('page', self.compute, 60, 2), 'old')
+        self.compute.assert_not_called()
+        self.assertEqual(get_cache_stats()['stale'], 2)
+
+    def test_old_generations_are_not_served_as_stale(self):
+        """Копия, отставшая больше чем на поколение, не отдаётся"""
+        get_or_compute('page', lambda: 'old', 0, 1)
+        cache.add('page:lock', 1, version=3)
+        with mock.patch('posts.cache.FEED_CACHE_LOCK_TIMEOUT', 0):
+            value = get_or_compute('page', self.compute, 60, 3)
+        self.assertEqual(value, 'fresh')
+        self.assertEqual(get_cache_stats()['stale'], 0)
+
+    def test_hits_do_not_write_to_cache(self):
+        """Попадания копятся в процессе, а не пишутся в кэш каждый раз"""
+        get_or_compute('page', self.compute, 60, 1)
+        with mock.patch('posts.cache.cache.incr') as incr:
+            get_or_compute('page', self.compute, 60, 1)
+        incr.assert_not_called()
+        self.assertEqual(get_cache_stats()['hit'], 1)
+
+    def test_waiting_worker_takes_value_from_lock_owner(self):
+        """Без старой копии воркер ждёт результат пересчёта"""
+        cache.add('page:lock', 1, version=1)
+
+        def sleep(seconds):
+            cache.set('page', ('computed elsewhere', time.time() + 60),
+                      version=1)
+
+        with mock.patch('posts.cache.time.sleep', sleep):
+            value = get_or_compute('page', self.compute, 60, 1)
+        self.assertEqual(value, 'computed elsewhere')
+        self.compute.assert_not_called()
@@ -0,0 +1,70 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from yatube.middleware import CompressionMiddleware
+
+HTML = '<div class="card">Тестовая запись</div>\n' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, PROFILING_HEADERS=True)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding='gzip, deflate'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_html_is_compressed(self):
+        """Большая HTML-страница сжимается в gzip, время попадает в метрики"""
+        response = HttpResponse(HTML)
+        response['Server-Timing'] = 'db;dur=1.0'
+        response['ETag'] = '"page"'
+        response = self.process(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), HTML)
+        self.assertEqual(
+            response['Content-Length'], str(len(response.content))
+        )
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"page"')
+        self.assertRegex(
+            response['Server-Timing'], r'^db;dur=1\.0, compress;dur=[\d.]+$'
+        )
+
+    @override_settings(PROFILING_HEADERS=False)
+    def test_compress_timing_is_hidden_from_clients(self):
+        """Без DEBUG и PROFILING_HEADERS время сжатия не отдаётся клиенту"""
+        response = self.process(HttpResponse(HTML))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_streaming_response_is_compressed_by_chunks(self):
+        """Потоковый ответ сжимается по частям, каждая часть — сразу"""
+        response = self.process(StreamingHttpResponse(
+            chunk.encode() for chunk in HTML.splitlines(keepends=True)
+        ))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), HTML.count('\n') + 1)
+        self.assertTrue(all(chunks[:-1]))
+        self.assertEqual(gzip.decompress(b''.join(chunks)).decode(), HTML)
+
+    def test_not_compressed_responses(self):
+        """Маленькие ответы, чужие типы и отказ клиента не сжимаются"""
+        cases = (
+            (HttpResponse('<p>коротко</p>'), 'gzip'),
+            (HttpResponse(HTML, content_type='image/jpeg'), 'gzip'),
+            (HttpResponse(HTML), 'identity'),
+            (HttpResponse(HTML), 'gzip;q=0'),
+        )
+        for response, accept_encoding in cases:
+            with self.subTest(
+                content_type=response['Content-Type'],
+                accept_encoding=accept_encoding
+            ):
+                response = self.process(response, accept_encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertNotIn('compress', response.get('Server-Timing', ''))
@@ -1,15 +1,20 @@
 import os
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.forms import fields, models
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Comment, Group, Post, User
+from posts.storage import hashed_storage
 
 AUTHOR_USERNAME = 'Andrey'
 AUTHOR_PASSWORD = 'qwerty'
@@ -130,6 +135,35 @@ class PostFormTests(TestCase):
             os.listdir(os.path.join(settings.MEDIA_ROOT, 'posts'))
         )
 
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_uploaded_image_is_readable_by_web_server(self):
+        """Загруженное через временный файл изображение доступно на чтение"""
+        image = SimpleUploadedFile('small.gif', IMAGE_FILE, 'image/gif')
+        self.author.post(
+            NEW_POST_URL, data={'text': 'Права файла', 'image': image}
+        )
+        post = Post.objects.get(text='Права файла')
+        mode = os.stat(post.image.path).st_mode & 0o777
+        self.assertEqual(mode, 0o644)
+
+    def test_image_is_stored_outside_transaction(self):
+        """Файл изображения записывается до транзакции сохранения записи"""
+        depth = len(connection.savepoint_ids)
+        depths = []
+        save = hashed_storage.save
+
+        def record_depth(*args, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+            return save(*args, **kwargs)
+
+        image = SimpleUploadedFile('small.gif', IMAGE_FILE, 'image/gif')
+        with mock.patch.object(hashed_storage, 'save', record_depth):
+            self.author.post(
+                NEW_POST_URL, data={'text': 'Вне транзакции', 'image': image}
+            )
+        self.assertTrue(Post.objects.filter(text='Вне транзакции').exists())
+        self.assertEqual(depths, [depth])
+
     def test_new_post_decline_file_types(self):
         """/new форма выдает ошибку при загрузке не изображения"""
         posts_count_before_adding = Post.objects.count()
@@ -198,3 +232,56 @@ class PostFormTests(TestCase):
         self.assertEqual(edited_post.text, form_data['text'])
         self.assertEqual(edited_post.group.id, form_data['group'])
         self.assertEqual(edited_post.author, self.user)
+
+
+def make_upload(name, size, image_format, exif=None):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(
+        buffer, image_format, **({'exif': exif} if exif else {})
+    )
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class UploadProcessingTests(TestCase):
+    def get_form(self, upload):
+        return PostForm(data={'text': 'Текст'}, files={'image': upload})
+
+    @mock.patch('posts.images.IMAGE_MAX_SIDE', 100)
+    def test_oversized_image_is_downscaled_without_exif(self):
+        """Слишком большое изображение уменьшается, EXIF удаляется"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        form = self.get_form(
+            make_upload('big.jpg', (300, 150), 'JPEG', exif.tobytes())
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_is_kept_as_is(self):
+        """Небольшое изображение без EXIF сохраняется без изменений"""
+        upload = make_upload('small.png', (20, 10), 'PNG')
+        form = self.get_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    @mock.patch('posts.images.IMAGE_MAX_PIXELS', 100)
+    def test_too_many_pixels_are_rejected(self):
+        """Изображение с большим разрешением отклоняется по заголовку"""
+        form = self.get_form(make_upload('big.png', (20, 10), 'PNG'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['image'],
+            ['Слишком большое разрешение изображения']
+        )
+
+    def test_unsupported_format_is_rejected(self):
+        """Изображения неподдерживаемых форматов отклоняются"""
+        form = self.get_form(make_upload('image.bmp', (20, 10), 'BMP'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['image'],
+            ['Неподдерживаемый формат изображения']
+        )
@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from posts.management.commands.benchmark import percentile
+from posts.models import (Comment, Follow, Group, Post, Timeline, User,
+                          UserStats)
+from posts.search import search_posts
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def generate(self, **options):
+        options = {
+            'users': 20,
+            'groups': 3,
+            'posts': 60,
+            'comments': 50,
+            'follows': 40,
+            'image_ratio': 0.2,
+            'prefix': 'bench',
+            **options,
+        }
+        call_command('generate_data', stdout=StringIO(), **options)
+
+    def test_generated_data_is_consistent(self):
+        """Данные создаются в заданном объёме вместе со служебными таблицами"""
+        self.generate()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 60
+        )
+        self.assertTrue(Timeline.objects.exists())
+        posts_with_images = Post.objects.exclude(image='')
+        self.assertTrue(posts_with_images.exists())
+        self.assertFalse(posts_with_images.filter(thumbnail_url='').exists())
+        self.assertTrue(search_posts(Post.objects.all(), 'котики').exists())
+
+    def test_popularity_is_skewed(self):
+        """Подписчики распределены неравномерно: первый автор популярнее"""
+        self.generate(follows=100, skew=1.5)
+        counts = list(
+            UserStats.objects
+            .order_by('user_id')
+            .values_list('followers_count', flat=True)
+        )
+        self.assertGreater(counts[0], counts[-1])
+
+    def test_existing_prefix_is_rejected(self):
+        """Повторный запуск с тем же префиксом завершается ошибкой"""
+        User.objects.create(username='bench0')
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+class PercentileTests(TestCase):
+    def test_percentile(self):
+        """Процентили берутся из отсортированного списка"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 51)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0)
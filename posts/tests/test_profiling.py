@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.middleware import ProfilingMiddleware
+from yatube.profiling import collapse, current_profile, timed
+
+AUTHOR_USERNAME = 'Andrey'
+
+INDEX_URL = reverse('index')
+
+TEMP_PROFILING_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    PROFILING_SAMPLE_RATE=1,
+    PROFILING_INTERVAL=0.0001,
+    PROFILING_DIR=TEMP_PROFILING_DIR,
+    PROFILING_HEADERS=True
+)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username=AUTHOR_USERNAME)
+        for number in range(3):
+            Post.objects.create(
+                text=f'Тестовая запись {number}', author=author
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_sampled_request_is_profiled(self):
+        """Профиль запроса пишется в Server-Timing и в файл стеков"""
+        response = Client().get(INDEX_URL)
+        timing = response['Server-Timing']
+        for category in ('sql', 'template', 'thumbnails', 'total'):
+            self.assertIn(f'{category};dur=', timing)
+        profiles = os.listdir(TEMP_PROFILING_DIR)
+        self.assertTrue(profiles)
+        with open(os.path.join(TEMP_PROFILING_DIR, profiles[0])) as file:
+            line = file.readline()
+        self.assertRegex(line, r'^\S+(;\S+)* \d+$')
+        self.assertIsNone(current_profile())
+
+    def test_frame_names_have_no_spaces(self):
+        """Имена кадров вроде <frozen runpy> не ломают формат стеков"""
+        outer = SimpleNamespace(
+            f_code=SimpleNamespace(
+                co_filename='<frozen runpy>', co_name='_run_module_as_main'
+            ),
+            f_back=None
+        )
+        inner = SimpleNamespace(
+            f_code=SimpleNamespace(co_filename='views.py', co_name='index'),
+            f_back=outer
+        )
+        self.assertEqual(
+            collapse(inner), '<frozen_runpy>:_run_module_as_main;views:index'
+        )
+
+    def test_templates_are_timed_per_include(self):
+        """Время и число отрисовок считаются по каждому шаблону"""
+        response = Client().get(INDEX_URL)
+        timing = response['X-Template-Timing']
+        self.assertRegex(timing, r'^index\.html;count=1;dur=[\d.]+')
+        self.assertRegex(
+            timing, r'include/post_item\.html;count=3;dur=[\d.]+'
+        )
+        self.assertIn('include/paginator.html;count=1;', timing)
+
+    @override_settings(PROFILING_HEADERS=False)
+    def test_timing_headers_are_shown_only_to_staff(self):
+        """Без DEBUG и PROFILING_HEADERS тайминги видят только сотрудники"""
+        response = Client().get(INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(response.has_header('X-Template-Timing'))
+        staff_client = Client()
+        staff_client.force_login(
+            User.objects.create(username='staff', is_staff=True)
+        )
+        response = staff_client.get(INDEX_URL)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertTrue(response.has_header('X-Template-Timing'))
+
+    def test_not_sampled_request_is_not_profiled(self):
+        """Запрос вне выборки обрабатывается без профиля"""
+        with override_settings(PROFILING_SAMPLE_RATE=0.5):
+            with mock.patch('yatube.middleware.random.random',
+                            return_value=0.9):
+                response = Client().get(INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(response.has_header('X-Template-Timing'))
+
+    def test_middleware_is_disabled_without_sampling(self):
+        """При нулевой доле запросов middleware не подключается"""
+        with override_settings(PROFILING_SAMPLE_RATE=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: None)
+
+    def test_timed_without_profile(self):
+        """Замер вне профилируемого запроса ничего не делает"""
+        with timed('thumbnails'):
+            self.assertIsNone(current_profile())
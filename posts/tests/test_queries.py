@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.settings import PAGE_POSTS_COUNT
+
+AUTHOR_USERNAME = 'Andrey'
+FOLLOWER_USERNAME = 'Petr'
+
+GROUP_SLUG = 'test-slug'
+
+INDEX_URL = reverse('index')
+GROUP_URL = reverse('group', kwargs={'slug': GROUP_SLUG})
+PROFILE_URL = reverse('profile', kwargs={'username': AUTHOR_USERNAME})
+FOLLOW_INDEX = reverse('follow_index')
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.follower = User.objects.create(username=FOLLOWER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=GROUP_SLUG
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Тестовая запись {i}',
+                author=self.author,
+                group=self.group
+            )
+            Comment.objects.create(
+                post=post,
+                author=self.follower,
+                text='Комментарий'
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.follower_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов страниц ленты не зависит от числа записей"""
+        urls = [INDEX_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX]
+        self.create_posts(1)
+        single_post_queries = {url: self.count_queries(url) for url in urls}
+        self.create_posts(PAGE_POSTS_COUNT - 1)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url),
+                    single_post_queries[url]
+                )
+
+    def test_feed_shows_annotated_comment_count(self):
+        """Лента выводит число комментариев из аннотации"""
+        self.create_posts(1)
+        cache.clear()
+        response = self.follower_client.get(INDEX_URL)
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.follower = User.objects.create(username=FOLLOWER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=GROUP_SLUG
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовая запись',
+            author=cls.author,
+            group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.follower,
+            text='Комментарий'
+        )
+        cls.POST_URL = reverse('post', args=[AUTHOR_USERNAME, cls.post.id])
+        cls.COMMENTS_URL = reverse(
+            'post_comments', args=[AUTHOR_USERNAME, cls.post.id]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.follower_client.get(url)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and 'posts_' in sql:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plans[sql] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def test_views_read_posts_through_indexes(self):
+        """Запросы страниц идут по индексам без сортировки во временной
+        таблице и без полного просмотра таблиц"""
+        cursor = CursorPaginator(
+            Comment.objects.all(), 1, ('created', 'id')
+        ).encode_cursor(Comment.objects.get())
+        urls = [
+            INDEX_URL,
+            GROUP_URL,
+            PROFILE_URL,
+            FOLLOW_INDEX,
+            self.POST_URL,
+            f'{self.COMMENTS_URL}?after={cursor}',
+        ]
+        for url in urls:
+            for sql, plan in self.get_plans(url).items():
+                with self.subTest(url=url, sql=sql):
+                    for step in plan:
+                        self.assertNotIn('TEMP B-TREE', step)
+                        if step.startswith('SCAN'):
+                            self.assertIn('INDEX', step)
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 0)
+    def test_follow_index_reads_celebrity_posts_through_indexes(self):
+        """Записи популярных авторов в ленте подписок читаются по индексу
+        записей автора без сортировки во временной таблице"""
+        plans = self.get_plans(FOLLOW_INDEX)
+        self.assertTrue(any('author_id" = ' in sql for sql in plans))
+        for sql, plan in plans.items():
+            with self.subTest(sql=sql):
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step)
+                    if step.startswith('SCAN'):
+                        self.assertIn('INDEX', step)
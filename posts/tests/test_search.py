@@ -0,0 +1,223 @@
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, SearchTerm, User
+from posts.search import FTS_TABLE, rebuild_index, search_posts, use_fts
+
+AUTHOR_USERNAME = 'Andrey'
+OTHER_USERNAME = 'Petr'
+
+GROUP_SLUG = 'test-slug'
+
+SEARCH_URL = reverse('search')
+
+# Больше 500 строк: столько SQLite не принимает в одном составном INSERT
+MANY_POSTS_COUNT = 600
+
+search_migration = import_module('posts.migrations.0024_search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.other = User.objects.create(username=OTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовое сообщество',
+            slug=GROUP_SLUG
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, posts=None):
+        posts = Post.objects.all() if posts is None else posts
+        return list(
+            search_posts(posts, query).order_by('rank', 'id')
+            .values_list('text', flat=True)
+        )
+
+    def check_ranking_and_updates(self):
+        Post.objects.create(text='Котики и собаки', author=self.author)
+        frequent = Post.objects.create(
+            text='Котики, котики, котики', author=self.author
+        )
+        commented = Post.objects.create(text='Про птиц', author=self.other)
+        self.assertEqual(
+            self.search('котики'),
+            ['Котики, котики, котики', 'Котики и собаки']
+        )
+        self.assertEqual(self.search('котики собаки'), ['Котики и собаки'])
+        Comment.objects.create(
+            post=commented, author=self.author, text='Где котики?'
+        )
+        self.assertIn('Про птиц', self.search('котики'))
+        frequent.text = 'Только собаки'
+        frequent.save()
+        self.assertNotIn('Только собаки', self.search('котики'))
+        frequent.delete()
+        self.assertEqual(self.search('только'), [])
+
+    def test_fts_index(self):
+        """Поиск по FTS5 ранжирует записи и обновляется вместе с ними"""
+        if not use_fts():
+            self.skipTest('SQLite собран без FTS5')
+        self.check_ranking_and_updates()
+
+    def test_python_index(self):
+        """Запасной индекс ранжирует записи и обновляется вместе с ними"""
+        with mock.patch('posts.search.use_fts', return_value=False):
+            self.check_ranking_and_updates()
+            self.assertTrue(SearchTerm.objects.exists())
+
+    def get_index(self):
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid, text, comments FROM {FTS_TABLE} '
+                    'ORDER BY rowid'
+                )
+                return cursor.fetchall()
+        return sorted(
+            SearchTerm.objects.values_list('post_id', 'term', 'weight')
+        )
+
+    def check_comments_are_appended(self):
+        post = Post.objects.create(text='Про птиц', author=self.author)
+        for text in ('Где котики?', 'Котики тут, птицы тоже', 'Собаки'):
+            with CaptureQueriesContext(connection) as queries:
+                Comment.objects.create(post=post, author=self.other, text=text)
+            self.assertFalse([
+                query for query in queries
+                if query['sql'].startswith('SELECT')
+                and '"posts_comment"' in query['sql']
+            ])
+        appended = self.get_index()
+        rebuild_index()
+        self.assertEqual(self.get_index(), appended)
+        self.assertEqual(self.search('котики птицы'), ['Про птиц'])
+
+    def test_fts_comments_are_appended(self):
+        """Новый комментарий дописывается в FTS5 без чтения остальных"""
+        if not use_fts():
+            self.skipTest('SQLite собран без FTS5')
+        self.check_comments_are_appended()
+
+    def test_python_comments_are_appended(self):
+        """Новый комментарий меняет только веса своих слов"""
+        with mock.patch('posts.search.use_fts', return_value=False):
+            self.check_comments_are_appended()
+
+    def test_search_filters_by_group_and_author(self):
+        """Поиск учитывает фильтры по сообществу и автору"""
+        Post.objects.create(
+            text='Котики в сообществе', author=self.author, group=self.group
+        )
+        Post.objects.create(text='Котики без сообщества', author=self.other)
+        response = self.client.get(
+            SEARCH_URL, {'q': 'котики', 'group': self.group.id}
+        )
+        self.assertEqual(
+            [post.text for post in response.context['page']],
+            ['Котики в сообществе']
+        )
+        response = self.client.get(
+            SEARCH_URL, {'q': 'котики', 'author': OTHER_USERNAME}
+        )
+        self.assertEqual(
+            [post.text for post in response.context['page']],
+            ['Котики без сообщества']
+        )
+
+    def test_search_pages_keep_query(self):
+        """Ссылки на соседние страницы сохраняют поисковый запрос"""
+        for number in range(12):
+            Post.objects.create(text=f'Котики {number}', author=self.author)
+        response = self.client.get(SEARCH_URL, {'q': 'котики'})
+        page = response.context['page']
+        self.assertEqual(len(page), 10)
+        query = urlencode({'q': 'котики'})
+        self.assertContains(
+            response, f'?{query}&amp;after={page.next_cursor}'
+        )
+        response = self.client.get(
+            SEARCH_URL, {'q': 'котики', 'after': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_query_without_words_finds_nothing(self):
+        """Запрос без слов даёт пустую выдачу, а не ошибку"""
+        Post.objects.create(text='Котики', author=self.author)
+        response = self.client.get(SEARCH_URL, {'q': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page']), [])
+
+    def test_fts_rank_is_computed_in_one_pass(self):
+        """MATCH и bm25 выполняются один раз на запрос, а не на строку"""
+        if not use_fts():
+            self.skipTest('SQLite собран без FTS5')
+        for number in range(12):
+            Post.objects.create(text=f'Котики {number}', author=self.author)
+        page = self.client.get(SEARCH_URL, {'q': 'котики'}).context['page']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                SEARCH_URL, {'q': 'котики', 'after': page.next_cursor}
+            )
+        searches = [
+            query['sql'] for query in queries if FTS_TABLE in query['sql']
+        ]
+        self.assertEqual(len(searches), 1)
+        self.assertEqual(searches[0].count('MATCH'), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {searches[0]}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        steps = [step for step in plan if FTS_TABLE in step]
+        self.assertEqual(len(steps), 1)
+        self.assertTrue(steps[0].startswith(f'SCAN {FTS_TABLE}'))
+
+    def test_rebuild_search_index(self):
+        """rebuild_search_index восстанавливает индекс"""
+        Post.objects.create(text='Котики', author=self.author)
+        with mock.patch('posts.search.use_fts', return_value=False):
+            SearchTerm.objects.all().delete()
+            call_command('rebuild_search_index', stdout=StringIO())
+            self.assertEqual(self.search('котики'), ['Котики'])
+
+    def create_many_posts(self):
+        Post.objects.bulk_create(
+            Post(text=f'Котики {i}', author=self.author)
+            for i in range(MANY_POSTS_COUNT)
+        )
+
+    def test_python_index_handles_many_posts(self):
+        """Запасной индекс не упирается в ограничение SQLite на число
+        строк в одном INSERT"""
+        self.create_many_posts()
+        with mock.patch('posts.search.use_fts', return_value=False):
+            rebuild_index()
+        self.assertEqual(
+            SearchTerm.objects.filter(term='котики').count(),
+            MANY_POSTS_COUNT
+        )
+
+    def test_migration_fills_python_index_for_many_posts(self):
+        """Миграция поиска заполняет запасной индекс для большого числа
+        записей"""
+        self.create_many_posts()
+        SearchTerm.objects.all().delete()
+        schema_editor = mock.Mock(connection=mock.Mock(vendor='postgresql'))
+        search_migration.fill_index(apps, schema_editor)
+        self.assertEqual(
+            SearchTerm.objects.filter(term='котики').count(),
+            MANY_POSTS_COUNT
+        )
@@ -0,0 +1,114 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from yatube.static import IMMUTABLE_CACHE_CONTROL, serve
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_DIR, 'source')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'static')
+
+CSS = b'body { color: black; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE=(
+        'yatube.static.CompressedManifestStaticFilesStorage'
+    )
+)
+class StaticPipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'app.css'), 'wb') as css:
+            css.write(CSS)
+        with open(os.path.join(SOURCE_DIR, 'css', 'tiny.css'), 'wb') as css:
+            css.write(b'a {}')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.factory = RequestFactory()
+        self.name = next(
+            name for name in os.listdir(os.path.join(STATIC_ROOT, 'css'))
+            if name.startswith('app.') and name.endswith('.css')
+            and name != 'app.css'
+        )
+        self.path = f'css/{self.name}'
+
+    def get(self, path, **headers):
+        request = self.factory.get(f'/static/{path}', **headers)
+        return serve(request, path, STATIC_ROOT)
+
+    def test_collectstatic_writes_compressed_copies(self):
+        """collectstatic кладёт рядом с хэшированным файлом копию .gz"""
+        with open(os.path.join(STATIC_ROOT, self.path + '.gz'), 'rb') as gz:
+            self.assertEqual(gzip.decompress(gz.read()), CSS)
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, 'css', 'tiny.css.gz')
+        ))
+
+    def test_hashed_file_is_immutable(self):
+        """Файл с хэшем в имени кэшируется навсегда и получает ETag"""
+        response = self.get(self.path)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('ETag', response)
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+
+    def test_plain_file_is_not_immutable(self):
+        """Файл без хэша в имени кэшируется ненадолго"""
+        response = self.get('css/app.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_compressed_copy_is_served(self):
+        """Клиенту, принимающему gzip, отдаётся сжатая копия"""
+        response = self.get(self.path, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(content), CSS)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без тела"""
+        etag = self.get(self.path)['ETag']
+        response = self.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files_are_not_found(self):
+        """Несуществующие файлы и пути за пределами каталога дают 404"""
+        for path in ('css/missing.css', '../source/css/app.css', 'css'):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.get(path)
+
+    def test_hashed_media_names_are_immutable(self):
+        """Имена изображений записей содержат хэш содержимого"""
+        os.makedirs(
+            os.path.join(STATIC_ROOT, 'posts', 'variants'), exist_ok=True
+        )
+        names = (
+            f'posts/{"a" * 64}.jpg',
+            f'posts/variants/{"b" * 64}_480.webp',
+        )
+        for name in names:
+            with self.subTest(name=name):
+                with open(os.path.join(STATIC_ROOT, name), 'wb') as image:
+                    image.write(b'image')
+                self.assertEqual(
+                    self.get(name)['Cache-Control'], IMMUTABLE_CACHE_CONTROL
+                )
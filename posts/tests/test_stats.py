@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, User, UserStats
+
+AUTHOR_USERNAME = 'Andrey'
+FOLLOWER_USERNAME = 'Petr'
+
+# Больше 500 строк: столько SQLite не принимает в одном составном INSERT
+MANY_USERS_COUNT = 600
+
+PROFILE_URL = reverse('profile', kwargs={'username': AUTHOR_USERNAME})
+PROFILE_FOLLOW = reverse('profile_follow',
+                         kwargs={'username': AUTHOR_USERNAME})
+PROFILE_UNFOLLOW = reverse('profile_unfollow',
+                           kwargs={'username': AUTHOR_USERNAME})
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.follower = User.objects.create(username=FOLLOWER_USERNAME)
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Подписка и отписка изменяют счётчики обоих пользователей"""
+        self.follower_client.get(PROFILE_FOLLOW)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.follower).following_count, 1)
+        self.follower_client.get(PROFILE_UNFOLLOW)
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+        self.assertEqual(self.get_stats(self.follower).following_count, 0)
+
+    def test_new_and_deleted_posts_update_counter(self):
+        """Создание и удаление записей изменяют счётчик записей"""
+        post = Post.objects.create(text='Текст', author=self.author)
+        Post.objects.create(text='Текст 2', author=self.author)
+        self.assertEqual(self.get_stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+
+    def test_profile_shows_counters(self):
+        """Профиль выводит счётчики из статистики пользователя"""
+        Post.objects.create(text='Текст', author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = self.follower_client.get(PROFILE_URL)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Записей: 1')
+
+    def test_rebuild_stats_fixes_drift(self):
+        """rebuild_stats пересчитывает счётчики по таблицам"""
+        Post.objects.create(text='Текст', author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        UserStats.objects.update(
+            followers_count=10,
+            following_count=10,
+            posts_count=10
+        )
+        call_command('rebuild_stats', stdout=StringIO())
+        author_stats = self.get_stats(self.author)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(self.get_stats(self.follower).following_count, 1)
+
+    def test_rebuild_stats_handles_many_users(self):
+        """rebuild_stats не упирается в ограничение SQLite на число строк
+        в одном INSERT"""
+        User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(MANY_USERS_COUNT)
+        )
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+
+    def test_deleting_user_with_posts(self):
+        """Удаление пользователя удаляет его статистику вместе с записями"""
+        author = User.objects.create(username='Ivan')
+        Post.objects.create(text='Текст', author=author)
+        Post.objects.create(text='Текст 2', author=author)
+        Follow.objects.create(user=self.follower, author=author)
+        author_id = author.id
+        author.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=author_id).exists())
+        self.assertEqual(self.get_stats(self.follower).following_count, 0)
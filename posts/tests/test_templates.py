@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.template import Context, Engine, engines
+from django.test import SimpleTestCase, override_settings
+
+from yatube.template_loaders import warm_templates
+
+TEMP_TEMPLATES_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+CACHED_TEMPLATES = [
+    {
+        **settings.TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **settings.TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                (
+                    'django.template.loaders.cached.Loader',
+                    settings.TEMPLATE_LOADERS
+                ),
+            ],
+        },
+    },
+]
+
+
+class ReloadingLoaderTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_TEMPLATES_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.engine = Engine(
+            dirs=[TEMP_TEMPLATES_DIR],
+            loaders=[(
+                'yatube.template_loaders.ReloadingLoader',
+                ['django.template.loaders.filesystem.Loader']
+            )]
+        )
+        self.path = os.path.join(TEMP_TEMPLATES_DIR, 'page.html')
+        self.write('первая версия', 1000)
+
+    def write(self, text, mtime):
+        with open(self.path, 'w', encoding='utf-8') as template_file:
+            template_file.write(text)
+        os.utime(self.path, (mtime, mtime))
+
+    def render(self):
+        return self.engine.get_template('page.html').render(Context())
+
+    def test_unchanged_template_is_cached(self):
+        """Неизменённый шаблон берётся из кэша"""
+        template = self.engine.get_template('page.html')
+        self.assertIs(self.engine.get_template('page.html'), template)
+
+    def test_changed_template_is_recompiled(self):
+        """После изменения файла шаблон компилируется заново"""
+        self.assertEqual(self.render(), 'первая версия')
+        self.write('вторая версия', 2000)
+        self.assertEqual(self.render(), 'вторая версия')
+
+
+class WarmTemplatesTests(SimpleTestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_all_templates_are_compiled(self):
+        """Все шаблоны из templates/ попадают в кэш загрузчика"""
+        count = warm_templates()
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertEqual(count, len(loader.get_template_cache))
+        for name in ('base.html', 'index.html', 'include/post_item.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, loader.get_template_cache)
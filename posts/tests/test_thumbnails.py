@@ -0,0 +1,244 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.images import MIME_TYPES, get_variant_formats, get_variant_names
+from posts.models import Post, User
+from posts.settings import IMAGE_RELEASE_GRACE
+from posts.storage import hashed_storage, write_file
+from posts.thumbnails import generate_thumbnail, release_image
+
+AUTHOR_USERNAME = 'Andrey'
+
+INDEX_URL = reverse('index')
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+IMAGE_FILE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.post = Post.objects.create(
+            text='Тестируем миниатюры',
+            author=self.author,
+            image=SimpleUploadedFile('small.gif', IMAGE_FILE, 'image/gif')
+        )
+
+    def test_thumbnail_is_stored_on_post(self):
+        """Миниатюра строится заранее и сохраняется в записи"""
+        generate_thumbnail(self.post.id)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail_url)
+        self.assertEqual(
+            (self.post.thumbnail_width, self.post.thumbnail_height),
+            (960, 339)
+        )
+        response = self.author_client.get(INDEX_URL)
+        self.assertContains(response, self.post.thumbnail_url)
+
+    def test_variants_are_listed_in_srcset(self):
+        """Варианты всех ширин и форматов выводятся в srcset"""
+        generate_thumbnail(self.post.id)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_srcset.count('w,'), 1)
+        self.assertIn('960w', self.post.thumbnail_srcset)
+        sources = dict(self.post.image_source_list)
+        for image_format in get_variant_formats():
+            if image_format != 'JPEG':
+                self.assertIn(MIME_TYPES[image_format], sources)
+        response = self.author_client.get(INDEX_URL)
+        self.assertContains(response, self.post.thumbnail_srcset)
+        for mime_type, srcset in sources.items():
+            self.assertContains(response, f'type="{mime_type}"')
+
+    def test_feed_does_not_use_thumbnail_engine(self):
+        """Лента выводится без обращения к движку миниатюр"""
+        with mock.patch(
+            'posts.thumbnails.build_variants'
+        ) as build_variants, mock.patch(
+            'PIL.Image.open', wraps=Image.open
+        ) as image_open:
+            response = self.author_client.get(INDEX_URL)
+        build_variants.assert_not_called()
+        image_open.assert_not_called()
+        self.assertContains(response, self.post.image.url)
+
+    def test_transparent_areas_become_white(self):
+        """Прозрачные области изображения в вариантах белые, а не чёрные"""
+        buffer = io.BytesIO()
+        Image.new('RGBA', (40, 30), (0, 0, 0, 0)).save(buffer, 'PNG')
+        self.post.image = SimpleUploadedFile(
+            'transparent.png', buffer.getvalue(), 'image/png'
+        )
+        self.post.save()
+        generate_thumbnail(self.post.id)
+        self.post.refresh_from_db()
+        name = self.post.thumbnail_url.replace(settings.MEDIA_URL, '', 1)
+        with default_storage.open(name) as variant:
+            pixel = Image.open(variant).convert('RGB').getpixel((0, 0))
+        self.assertGreater(min(pixel), 240)
+
+    def test_new_image_resets_thumbnail(self):
+        """Замена изображения сбрасывает устаревшую миниатюру"""
+        generate_thumbnail(self.post.id)
+        self.author_client.post(
+            reverse('post_edit', args=[AUTHOR_USERNAME, self.post.id]),
+            data={
+                'text': self.post.text,
+                'image': SimpleUploadedFile(
+                    'other.gif', IMAGE_FILE, 'image/gif'
+                ),
+            }
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_url, '')
+        self.assertIsNone(self.post.thumbnail_width)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, name, content=IMAGE_FILE):
+        return Post.objects.create(
+            text='Тестируем хранилище',
+            author=self.author,
+            image=SimpleUploadedFile(name, content, 'image/gif')
+        )
+
+    def test_identical_uploads_share_file_and_variants(self):
+        """Одинаковые загрузки хранятся одним файлом с общими миниатюрами"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        generate_thumbnail(first.id)
+        with mock.patch('posts.thumbnails.build_variants') as build_variants:
+            generate_thumbnail(second.id)
+        build_variants.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.thumbnail_url, second.thumbnail_url)
+
+    def age(self, name):
+        """Сдвигает время изменения файла за пределы IMAGE_RELEASE_GRACE"""
+        past = time.time() - IMAGE_RELEASE_GRACE - 1
+        os.utime(hashed_storage.path(name), (past, past))
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл и миниатюры удаляются вместе с последней записью"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        generate_thumbnail(first.id)
+        first.refresh_from_db()
+        name = first.image.name
+        self.age(name)
+        thumbnail_name = first.thumbnail_url[len(settings.MEDIA_URL):]
+        first.delete()
+        release_image(name)
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        release_image(name)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(thumbnail_name))
+
+    def test_recently_saved_file_is_kept(self):
+        """Только что сохранённый файл не удаляется: запись может быть
+        ещё не сохранена"""
+        post = self.create_post('first.gif')
+        name = post.image.name
+        post.delete()
+        release_image(name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_upload_during_release_keeps_file(self):
+        """Загрузка того же содержимого во время удаления сохраняет файл"""
+        post = self.create_post('first.gif')
+        name = post.image.name
+        self.age(name)
+        post.delete()
+
+        def is_used():
+            self.create_post('second.gif')
+            return False
+
+        self.assertFalse(hashed_storage.delete_unused(name, is_used))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_variants_are_overwritten_in_place(self):
+        """Повторная запись варианта не создаёт копию с суффиксом, а при
+        удалении убираются все варианты"""
+        post = self.create_post('first.gif')
+        generate_thumbnail(post.id)
+        stem = os.path.splitext(os.path.basename(post.image.name))[0]
+        variants = default_storage.listdir('posts/variants')[1]
+        variant = f'posts/variants/{variants[0]}'
+        self.assertIn(variant, get_variant_names(stem))
+        write_file(default_storage, variant, ContentFile(b'variant'))
+        self.assertEqual(
+            default_storage.listdir('posts/variants')[1], variants
+        )
+        self.age(post.image.name)
+        name = post.image.name
+        post.delete()
+        release_image(name)
+        self.assertFalse(default_storage.listdir('posts/variants')[1])
+
+    def test_sweep_releases_files_skipped_during_grace(self):
+        """release_images удаляет файлы, пропущенные при освобождении
+        в пределах IMAGE_RELEASE_GRACE, и не трогает используемые"""
+        kept = self.create_post('first.gif')
+        buffer = io.BytesIO()
+        Image.new('RGB', (2, 1), 'red').save(buffer, 'GIF')
+        replaced = self.create_post('second.gif', buffer.getvalue())
+        name = replaced.image.name
+        replaced.delete()
+        release_image(name)
+        self.assertTrue(default_storage.exists(name))
+        self.age(name)
+        self.age(kept.image.name)
+        call_command('release_images', stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(kept.image.name))
@@ -0,0 +1,149 @@
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, Timeline, User
+from posts.timeline import TimelinePaginator, rebuild_timelines, refill
+
+AUTHOR_USERNAME = 'Andrey'
+FOLLOWER_USERNAME = 'Petr'
+OTHER_FOLLOWER_USERNAME = 'Ivan'
+
+FOLLOW_INDEX = reverse('follow_index')
+PROFILE_FOLLOW = reverse('profile_follow',
+                         kwargs={'username': AUTHOR_USERNAME})
+PROFILE_UNFOLLOW = reverse('profile_unfollow',
+                           kwargs={'username': AUTHOR_USERNAME})
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.follower = User.objects.create(username=FOLLOWER_USERNAME)
+        cls.other_follower = User.objects.create(
+            username=OTHER_FOLLOWER_USERNAME
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_new_post_pushed_to_followers_timeline(self):
+        """Новая запись попадает в ленты подписчиков автора"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+        self.assertFalse(
+            Timeline.objects.filter(user=self.other_follower).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_purges_timeline(self):
+        """Подписка наполняет ленту записями автора, отписка очищает её"""
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.follower_client.get(PROFILE_FOLLOW)
+        response = self.follower_client.get(FOLLOW_INDEX)
+        self.assertIn(post, response.context['page'])
+        self.follower_client.get(PROFILE_UNFOLLOW)
+        self.assertFalse(Timeline.objects.filter(user=self.follower).exists())
+        response = self.follower_client.get(FOLLOW_INDEX)
+        self.assertNotIn(post, response.context['page'])
+
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_timeline_is_bounded(self):
+        """Лента подписок хранит не больше TIMELINE_LENGTH записей"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+            for i in range(4)
+        ]
+        entries = Timeline.objects.filter(user=self.follower)
+        self.assertLessEqual(entries.count(), 2)
+        self.assertTrue(entries.filter(post=posts[-1]).exists())
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Записи автора с большим числом подписчиков читаются при запросе"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other_follower, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        response = self.follower_client.get(FOLLOW_INDEX)
+        self.assertIn(post, response.context['page'])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_author_below_fanout_limit_is_pushed_again(self):
+        """После отписки ниже порога записи автора возвращаются в ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other_follower, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        with mock.patch('posts.timeline.transaction.on_commit') as on_commit:
+            Follow.objects.get(user=self.other_follower).delete()
+        on_commit.assert_called_once()
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        refill(self.author.id)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+        response = self.follower_client.get(FOLLOW_INDEX)
+        self.assertIn(post, response.context['page'])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_timeline_pages_merge_celebrity_posts(self):
+        """Страницы ленты сливают записи ленты и популярных авторов
+        в порядке публикации и переходят по курсорам в обе стороны"""
+        celebrity = User.objects.create(username='Celebrity')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=celebrity)
+        Follow.objects.create(user=self.other_follower, author=celebrity)
+        posts = [
+            Post.objects.create(
+                text=f'Текст {i}',
+                author=celebrity if i % 2 else self.author
+            )
+            for i in range(5)
+        ][::-1]
+        paginator = TimelinePaginator(self.follower, 2)
+        pages = []
+        page = paginator.get_page()
+        while True:
+            pages.append(list(page))
+            if not page.has_next():
+                break
+            page = paginator.get_page(after=page.next_cursor)
+        self.assertEqual(pages, [posts[:2], posts[2:4], posts[4:]])
+        page = paginator.get_page(before=page.previous_cursor)
+        self.assertEqual(list(page), posts[2:4])
+
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_rebuild_replaces_each_timeline(self):
+        """Пересборка восстанавливает ленты и убирает лишние записи"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+            for i in range(3)
+        ]
+        Timeline.objects.filter(user=self.follower).delete()
+        Timeline.objects.create(
+            user=self.other_follower, post=posts[0],
+            pub_date=posts[0].pub_date
+        )
+        self.assertEqual(rebuild_timelines(), 2)
+        self.assertEqual(
+            set(Timeline.objects.values_list('user_id', 'post_id')),
+            {(self.follower.id, post.id) for post in posts[1:]}
+        )
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_rebuild_skips_celebrities(self):
+        """Пересборка не раскладывает записи популярных авторов"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other_follower, author=self.author)
+        Post.objects.create(text='Текст', author=self.author)
+        self.assertEqual(rebuild_timelines(), 0)
+        self.assertFalse(Timeline.objects.exists())
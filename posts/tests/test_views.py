@@ -1,14 +1,21 @@
+import base64
+import math
 import os
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Follow, Post, User
-from posts.settings import PAGE_POSTS_COUNT
+from posts.models import Comment, Group, Follow, Post, User
+from posts.paginator import CursorPaginator
+from posts.settings import COMMENTS_PAGE_SIZE, PAGE_POSTS_COUNT
 
 AUTHOR_USERNAME = 'Andrey'
 AUTHOR_PASSWORD = 'qwerty'
@@ -20,6 +27,7 @@ GROUP_1_SLUG = 'test-slug'
 GROUP_2_SLUG = 'test-slug-2'
 
 POSTS_COUNT = PAGE_POSTS_COUNT * 2
+COMMENTS_COUNT = 35
 
 INDEX_URL = reverse('index')
 GROUP_1_URL = reverse('group', kwargs={'slug': GROUP_1_SLUG})
@@ -207,3 +215,186 @@ class PaginatorViewsTest(TestCase):
             response.context['page'].end_index(),
             PAGE_POSTS_COUNT
         )
+
+    def test_next_and_previous_cursors_walk_the_feed(self):
+        """Курсоры ?after= и ?before= ведут на соседние страницы"""
+        cache.clear()
+        first_page = self.guest_client.get(INDEX_URL).context['page']
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.guest_client.get(
+            INDEX_URL, {'after': first_page.next_cursor}
+        ).context['page']
+        self.assertEqual(
+            len(second_page), POSTS_COUNT - 1 - PAGE_POSTS_COUNT
+        )
+        self.assertIsNone(second_page.next_cursor)
+        self.assertTrue(
+            first_page[-1].pub_date >= second_page[0].pub_date
+        )
+        back_page = self.guest_client.get(
+            INDEX_URL, {'before': second_page.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_broken_cursor_shows_first_page(self):
+        """Некорректный курсор приводит на первую страницу"""
+        cache.clear()
+        page = self.guest_client.get(
+            INDEX_URL, {'after': 'broken'}
+        ).context['page']
+        self.assertEqual(len(page), PAGE_POSTS_COUNT)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_forged_cursor_shows_first_page(self):
+        """Курсор с null, объектом или списком приводит на первую страницу"""
+        for values in ('[null, null]', '[{}, 1]', '["2020-01-01", []]'):
+            with self.subTest(values=values):
+                cache.clear()
+                cursor = base64.urlsafe_b64encode(values.encode()).decode()
+                response = self.guest_client.get(INDEX_URL, {'after': cursor})
+                self.assertEqual(response.status_code, 200)
+                page = response.context['page']
+                self.assertEqual(len(page), PAGE_POSTS_COUNT)
+                self.assertIsNone(page.previous_cursor)
+
+    def test_feed_pages_do_not_count_posts(self):
+        """Страницы ленты не выполняют COUNT(*) по записям"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            page = self.guest_client.get(INDEX_URL).context['page']
+            second_page = self.guest_client.get(
+                INDEX_URL, {'after': page.next_cursor}
+            ).context['page']
+            pages = (page, second_page)
+            flags = [(p.has_previous(), p.has_next()) for p in pages]
+            [(p.end_index(), p.paginator.count) for p in pages]
+        self.assertEqual(flags, [(False, True), (True, False)])
+        self.assertFalse(
+            [query for query in queries if 'COUNT(*)' in query['sql']]
+        )
+
+
+class StreamingPostViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=AUTHOR_USERNAME)
+        cls.post = Post.objects.create(text='Тестовая запись', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_COUNT)
+        )
+        cls.url = reverse('post', args=[AUTHOR_USERNAME, cls.post.id])
+        cls.comments_url = reverse(
+            'post_comments', args=[AUTHOR_USERNAME, cls.post.id]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_post_page_shows_first_comments(self):
+        """На странице записи только первые комментарии и курсор дальше"""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PAGE_SIZE)
+        self.assertEqual(
+            list(comments),
+            list(Comment.objects.order_by('created', 'id')[
+                :COMMENTS_PAGE_SIZE
+            ])
+        )
+        self.assertTrue(response.context['next_cursor'])
+        self.assertContains(response, 'js-load-comments')
+
+    def test_comments_cost_constant_queries(self):
+        """Число запросов не зависит от числа комментариев"""
+        post = Post.objects.create(text='Другая запись', author=self.user)
+        Comment.objects.create(post=post, author=self.user, text='Один')
+        other_url = reverse('post', args=[AUTHOR_USERNAME, post.id])
+        counts = []
+        for url in (self.url, other_url):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_load_more_walks_all_comments(self):
+        """Кнопка «Показать ещё» подгружает остальные комментарии"""
+        cursor = self.client.get(self.url).context['next_cursor']
+        names = []
+        while cursor:
+            response = self.client.get(
+                self.comments_url, {'after': cursor, 'format': 'json'}
+            )
+            data = response.json()
+            names += [comment['text'] for comment in data['comments']]
+            cursor = data['next']
+        self.assertEqual(
+            names,
+            [f'Комментарий {i}' for i in range(COMMENTS_PAGE_SIZE,
+                                               COMMENTS_COUNT)]
+        )
+
+    def test_load_more_fragment(self):
+        """HTML-фрагмент содержит комментарии без разметки страницы"""
+        cursor = self.client.get(self.url).context['next_cursor']
+        response = self.client.get(self.comments_url, {'after': cursor})
+        self.assertTemplateUsed(response, 'include/comment_page.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            response.content.decode().count('name="comment_'),
+            COMMENTS_COUNT - COMMENTS_PAGE_SIZE
+        )
+
+    def test_load_more_rejects_forged_cursor(self):
+        """Подделанный курсор «Показать ещё» даёт 400, а не ошибку"""
+        for values in ('[null, null]', '[{}, []]', 'broken'):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(values.encode()).decode()
+                response = self.client.get(
+                    self.comments_url, {'after': cursor, 'format': 'json'}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_comments_deleted_after_count(self):
+        """Комментарии, удалённые между запросами, не ломают страницу"""
+        paginator = CursorPaginator(
+            Comment.objects.none(), COMMENTS_PAGE_SIZE, ('created', 'id')
+        )
+        with mock.patch(
+            'posts.views.get_comments_paginator', return_value=paginator
+        ):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_small_post_page_is_rendered_whole(self):
+        """Страница со всеми комментариями до порога не потоковая"""
+        with mock.patch('posts.views.COMMENTS_STREAM_THRESHOLD', 1000):
+            response = self.client.get(self.url, {'comments': 'all'})
+        self.assertFalse(response.streaming)
+        self.assertEqual(
+            response.content.decode().count('name="comment_'),
+            COMMENTS_COUNT
+        )
+
+    def test_long_post_page_is_streamed(self):
+        """Начало страницы уходит сразу, комментарии — частями"""
+        with mock.patch('posts.views.COMMENTS_STREAM_THRESHOLD', 10), \
+                mock.patch('posts.streaming.COMMENTS_CHUNK_SIZE', 10):
+            response = self.client.get(self.url, {'comments': 'all'})
+            chunks = [
+                chunk.decode() for chunk in response.streaming_content
+            ]
+        self.assertTrue(response.streaming)
+        self.assertIn('Тестовая запись', chunks[0])
+        self.assertIn('csrfmiddlewaretoken', chunks[0])
+        self.assertNotIn('name="comment_', chunks[0])
+        self.assertEqual(len(chunks), math.ceil(COMMENTS_COUNT / 10) + 2)
+        page = ''.join(chunks)
+        self.assertEqual(page.count('name="comment_'), COMMENTS_COUNT)
+        self.assertNotIn('<!-- comments:', page)
+        self.assertTrue(page.rstrip().endswith('</html>'))
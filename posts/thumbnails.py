@@ -0,0 +1,137 @@
+import logging
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_feed_version
+from .images import build_variants, get_variant_names
+from .models import Post
+from .settings import THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+THUMBNAIL_FIELDS = (
+    'thumbnail_url', 'thumbnail_width', 'thumbnail_height',
+    'thumbnail_srcset', 'image_sources'
+)
+
+
+def clear_thumbnail(post):
+    post.thumbnail_url = ''
+    post.thumbnail_width = None
+    post.thumbnail_height = None
+    post.thumbnail_srcset = ''
+    post.image_sources = ''
+
+
+def generate_thumbnail(post_id):
+    """Строит варианты изображения записи и сохраняет их адреса в записи"""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    fields = (
+        Post.objects
+        .filter(image=post.image.name)
+        .exclude(thumbnail_url='')
+        .values(*THUMBNAIL_FIELDS)
+        .first()
+    )
+    if fields is None:
+        try:
+            fields = build_variants(post.image)
+        except Exception:
+            logger.exception(
+                'Не удалось построить миниатюры записи %s', post_id
+            )
+            return
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        updated=timezone.now(),
+        **fields
+    )
+    bump_feed_version()
+
+
+def release_image(name):
+    """
+    Удаляет файл изображения и его варианты, если он больше не нужен.
+    Возвращает, удалён ли файл.
+    """
+    if not name:
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        deleted = storage.delete_unused(
+            name, Post.objects.filter(image=name).exists
+        )
+    except SuspiciousFileOperation:
+        logger.warning('Файл %s находится вне хранилища', name)
+        return False
+    if not deleted:
+        return False
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for variant_name in get_variant_names(stem):
+        default_storage.delete(variant_name)
+    return True
+
+
+def release_unused_images():
+    """
+    Освобождает файлы изображений без ссылок. Досрочно сохранённые файлы
+    пропускаются при освобождении после транзакции, пока не истечёт
+    IMAGE_RELEASE_GRACE, и подбираются этим обходом. Возвращает число
+    удалённых файлов.
+    """
+    storage = Post._meta.get_field('image').storage
+    upload_to = Post._meta.get_field('image').upload_to
+    try:
+        filenames = storage.listdir(upload_to)[1]
+    except FileNotFoundError:
+        return 0
+    count = 0
+    for filename in filenames:
+        if filename.startswith('.') or filename.endswith('.released'):
+            continue
+        name = posixpath.join(upload_to, filename)
+        if release_image(name):
+            count += 1
+    return count
+
+
+def schedule_release(name):
+    """Освобождает изображение после фиксации транзакции"""
+    if name:
+        transaction.on_commit(lambda: release_image(name))
+
+
+def _generate_in_background(post_id):
+    try:
+        generate_thumbnail(post_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnail(post):
+    """Ставит построение миниатюры в очередь после фиксации транзакции"""
+    if not post.image:
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_generate_in_background, post.pk)
+    )
@@ -0,0 +1,245 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+
+from .models import Follow, Post, Timeline, UserStats
+from .paginator import CursorPaginator, paginate
+from .settings import (PAGE_POSTS_COUNT, TIMELINE_BATCH_SIZE,
+                       TIMELINE_FANOUT_LIMIT, TIMELINE_LENGTH)
+
+_executor = None
+
+
+def get_executor():
+    """
+    Один фоновый поток: ленты перезаписываются по очереди и не
+    соперничают друг с другом за блокировку базы
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='timeline'
+        )
+    return _executor
+
+
+def get_celebrity_ids(user):
+    """Авторы из подписок user, записи которых не рассылаются по лентам"""
+    return list(
+        Follow.objects
+        .filter(
+            user=user,
+            author__stats__followers_count__gt=TIMELINE_FANOUT_LIMIT
+        )
+        .values_list('author_id', flat=True)
+    )
+
+
+def is_celebrity(author_id):
+    """
+    Записи автора не рассылаются по лентам. Решение принимается по тем же
+    счётчикам подписчиков, что и в get_celebrity_ids, чтобы запись всегда
+    попадала либо в ленту, либо в выборку при чтении.
+    """
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gt=TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def get_follower_ids(author_id):
+    return list(
+        Follow.objects
+        .filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def trim(user_ids):
+    """
+    Обрезает ленты user_ids до TIMELINE_LENGTH записей. Граница ищется
+    по индексу (user, -pub_date) один раз на ленту, а удаление идёт
+    простым сравнением с ней.
+    """
+    for user_id in user_ids:
+        cutoff = (
+            Timeline.objects
+            .filter(user_id=user_id)
+            .order_by('-pub_date')
+            .values_list('pub_date', flat=True)
+            [TIMELINE_LENGTH:TIMELINE_LENGTH + 1]
+        )
+        for pub_date in cutoff:
+            Timeline.objects.filter(
+                user_id=user_id, pub_date__lte=pub_date
+            ).delete()
+
+
+def add_entries(user_ids, posts):
+    """Записи posts, пары (id, pub_date), в ленты пользователей user_ids"""
+    if not posts:
+        return
+    step = max(TIMELINE_BATCH_SIZE // len(posts), 1)
+    for start in range(0, len(user_ids), step):
+        chunk = user_ids[start:start + step]
+        Timeline.objects.bulk_create(
+            [
+                Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+                for user_id in chunk
+                for post_id, pub_date in posts
+            ],
+            batch_size=TIMELINE_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        trim(chunk)
+
+
+def get_recent_posts(author_id):
+    return list(
+        Post.objects
+        .filter(author_id=author_id)
+        .values_list('id', 'pub_date')[:TIMELINE_LENGTH]
+    )
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    add_entries(
+        get_follower_ids(post.author_id), [(post.pk, post.pub_date)]
+    )
+
+
+def backfill(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    add_entries([user_id], get_recent_posts(author_id))
+
+
+def refill(author_id):
+    """Раскладывает последние записи автора по лентам его подписчиков"""
+    add_entries(get_follower_ids(author_id), get_recent_posts(author_id))
+
+
+def _refill_in_background(author_id):
+    try:
+        refill(author_id)
+    finally:
+        connections.close_all()
+
+
+def purge(user_id, author_id):
+    """
+    Убирает записи автора из ленты отписавшегося. Если у автора осталось
+    ровно TIMELINE_FANOUT_LIMIT подписчиков, его записи больше не
+    подмешиваются при чтении: они раскладываются по лентам подписчиков
+    в фоне после фиксации транзакции, а не в запросе отписки.
+    """
+    Timeline.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+    left_celebrities = UserStats.objects.filter(
+        user_id=author_id, followers_count=TIMELINE_FANOUT_LIMIT
+    )
+    if left_celebrities.exists():
+        transaction.on_commit(
+            lambda: get_executor().submit(_refill_in_background, author_id)
+        )
+
+
+def rebuild_timeline(user_id):
+    """Заменяет ленту читателя одной транзакцией, возвращает число строк"""
+    author_ids = (
+        Follow.objects
+        .filter(user_id=user_id)
+        .exclude(author__stats__followers_count__gt=TIMELINE_FANOUT_LIMIT)
+        .values('author_id')
+    )
+    posts = (
+        Post.objects
+        .filter(author_id__in=author_ids)
+        .order_by('-pub_date')
+        .values_list('id', 'pub_date')[:TIMELINE_LENGTH]
+    )
+    with transaction.atomic():
+        Timeline.objects.filter(user_id=user_id).delete()
+        return len(Timeline.objects.bulk_create(
+            [
+                Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+                for post_id, pub_date in posts
+            ],
+            batch_size=TIMELINE_BATCH_SIZE
+        ))
+
+
+def rebuild_timelines():
+    """
+    Заново заполняет ленты подписок по таблицам подписок и записей.
+    Лента каждого читателя заменяется отдельно, так что остальные ленты
+    во время пересборки остаются заполненными.
+    """
+    Timeline.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')
+    ).delete()
+    user_ids = (
+        Follow.objects
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    return sum(rebuild_timeline(user_id) for user_id in list(user_ids))
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок по курсорам. Ключи страницы читаются по индексу ленты
+    (user, -pub_date, -post) и отдельным запросом с LIMIT по индексу
+    записей каждого популярного автора, сливаются, и только записи
+    итоговой страницы загружаются целиком.
+    """
+    timeline_ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.user = user
+        self.celebrity_ids = get_celebrity_ids(user)
+
+    def fetch(self, values, forward):
+        limit = self.per_page + 1
+        ordering = self.timeline_ordering
+        entries = Timeline.objects.filter(user=self.user)
+        if values:
+            entries = entries.filter(
+                self._cursor_filter(values, forward, ordering)
+            )
+        if not forward:
+            ordering = self._reversed_ordering(ordering)
+        keys = set(
+            entries
+            .order_by(*ordering)
+            .values_list('pub_date', 'post_id')[:limit]
+        )
+        for author_id in self.celebrity_ids:
+            posts = Post.objects.filter(author_id=author_id)
+            if values:
+                posts = posts.filter(self._cursor_filter(values, forward))
+            ordering = (
+                self.ordering if forward else self._reversed_ordering()
+            )
+            keys.update(
+                posts
+                .order_by(*ordering)
+                .values_list('pub_date', 'id')[:limit]
+            )
+        keys = sorted(keys, reverse=forward)[:limit]
+        posts = self.object_list.order_by().in_bulk(
+            [post_id for pub_date, post_id in keys]
+        )
+        return [
+            posts[post_id] for pub_date, post_id in keys if post_id in posts
+        ]
+
+
+def get_timeline_page(request, per_page=PAGE_POSTS_COUNT):
+    return paginate(request, TimelinePaginator(request.user, per_page))
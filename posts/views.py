@@ -1,27 +1,43 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from .forms import CommentForm, PostForm
+from .cache import conditional_page, get_cached_page
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post, User
-from .settings import PAGE_POSTS_COUNT
+from .paginator import CursorPaginator, get_page
+from .search import search_posts
+from .settings import COMMENTS_PAGE_SIZE, COMMENTS_STREAM_THRESHOLD
+from .streaming import stream_comments
+from .thumbnails import (clear_thumbnail, schedule_release,
+                         schedule_thumbnail)
+from .timeline import get_timeline_page
 
+COMMENTS_ORDERING = ('created', 'id')
 
+
+def get_comments_paginator(post):
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PAGE_SIZE,
+        COMMENTS_ORDERING
+    )
+
+
+@conditional_page
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, PAGE_POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = Post.objects.feed()
+    page = get_cached_page(request, 'index', posts)
     context = {'page': page}
     return render(request, 'index.html', context)
 
 
+@conditional_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, PAGE_POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.feed()
+    page = get_cached_page(request, f'group:{group.pk}', posts)
     context = {'group': group, 'page': page}
     return render(request, 'group.html', context)
 
@@ -33,19 +49,25 @@ def new_post(request):
         return render(request, 'new_post.html', {'form': form})
     new_post = form.save(commit=False)
     new_post.author = request.user
-    new_post.save()
+    # Файл пишется до транзакции, чтобы не держать блокировку записи SQLite
+    new_post.image.field.pre_save(new_post, add=True)
+    with transaction.atomic():
+        new_post.save()
+        schedule_thumbnail(new_post)
     return redirect('index')
 
 
+@conditional_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    posts = author.posts.feed()
     is_author = False
     if author == request.user:
         is_author = True
-    paginator = Paginator(posts, PAGE_POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_cached_page(request, f'profile:{author.pk}', posts)
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(user=request.user, author=author)
@@ -59,8 +81,13 @@ def profile(request, username):
     return render(request, 'profile.html', context)
 
 
+@conditional_page
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'),
+        author__username=username,
+        id=post_id
+    )
     is_author = False
     if post.author == request.user:
         is_author = True
@@ -71,7 +98,16 @@ def post_view(request, username, post_id):
         new_comment.post = post
         new_comment.save()
         return redirect('post', username=username, post_id=post_id)
-    comments = post.comments.all()
+    paginator = get_comments_paginator(post)
+    comments = paginator.object_list.order_by(*COMMENTS_ORDERING)
+    show_all = request.GET.get('comments') == 'all'
+    next_cursor = None
+    if not show_all:
+        comments = comments[:COMMENTS_PAGE_SIZE]
+        if post.comment_count > COMMENTS_PAGE_SIZE:
+            loaded = list(comments)
+            if loaded:
+                next_cursor = paginator.encode_cursor(loaded[-1])
     is_post = True
     following = (
         request.user.is_authenticated
@@ -82,12 +118,54 @@ def post_view(request, username, post_id):
         'form': form,
         'following': following,
         'comments': comments,
+        'next_cursor': next_cursor,
         'is_post': is_post,
         'is_author': is_author,
     }
+    if show_all and post.comment_count >= COMMENTS_STREAM_THRESHOLD:
+        return stream_comments(request, 'post.html', context)
     return render(request, 'post.html', context)
 
 
+@conditional_page
+def post_comments(request, username, post_id):
+    """
+    Следующая страница комментариев после курсора ?after=: HTML-фрагмент
+    для кнопки «Показать ещё» или JSON при ?format=json. На
+    некорректный курсор отвечает 400, а не первой страницей, чтобы
+    клиент не дописал уже показанные комментарии.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username,
+        id=post_id
+    )
+    paginator = get_comments_paginator(post)
+    after = request.GET.get('after')
+    if after and paginator.decode_cursor(after) is None:
+        return HttpResponseBadRequest()
+    page = paginator.get_page(after=after)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in page
+            ],
+            'next': page.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': page,
+        'next_cursor': page.next_cursor,
+    }
+    return render(request, 'include/comment_page.html', context)
+
+
 @login_required
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -105,12 +183,19 @@ def post_edit(request, username, post_id):
     if username != request.user.username:
         return redirect('post', username=username, post_id=post_id)
     post = get_object_or_404(Post, author=request.user, id=post_id)
+    old_image = post.image.name
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if not form.is_valid():
         context = {'form': form, 'post': post}
         return render(request, 'new_post.html', context)
-    form.save()
+    post = form.save(commit=False)
+    if 'image' in form.changed_data:
+        clear_thumbnail(post)
+    post.save()
+    if 'image' in form.changed_data:
+        schedule_thumbnail(post)
+        schedule_release(old_image)
     return redirect('post', username=username, post_id=post_id)
 
 
@@ -129,15 +214,12 @@ def server_error(request):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, PAGE_POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {'page': page, 'posts': posts}
-    return render(request, 'follow.html', context)
+    page = get_timeline_page(request)
+    return render(request, 'follow.html', {'page': page})
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     follow_user = get_object_or_404(User, username=username)
     if follow_user != request.user:
@@ -146,6 +228,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     unfollow_user = get_object_or_404(User, username=username)
     get_object_or_404(
@@ -154,3 +237,23 @@ def profile_unfollow(request, username):
         author=unfollow_user
     ).delete()
     return redirect('profile', username=username)
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    page = None
+    if form.is_valid():
+        posts = Post.objects.feed()
+        if form.cleaned_data['group']:
+            posts = posts.filter(group=form.cleaned_data['group'])
+        if form.cleaned_data['author']:
+            posts = posts.filter(
+                author__username=form.cleaned_data['author']
+            )
+        posts = search_posts(posts, form.cleaned_data['q'])
+        page = get_page(request, posts, ordering=('rank', 'id'))
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    context = {'form': form, 'page': page, 'query': query.urlencode()}
+    return render(request, 'search.html', context)
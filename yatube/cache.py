@@ -0,0 +1,137 @@
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кэш в отдельном файле SQLite, общий для всех процессов и потоков
+    сервера. Не требует внешних сервисов: LOCATION — путь к файлу кэша.
+    """
+    cull_probability = 0.01
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _select(self, key):
+        row = self._connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] is not None and row[1] < time.time():
+            return None
+        return row
+
+    def _write(self, key, value, timeout):
+        expires = self.get_backend_timeout(timeout)
+        cursor = self._connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+        )
+        if random.random() < self.cull_probability:
+            self._cull()
+        return cursor.rowcount > 0
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires < ?', (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires IS NULL, expires '
+                'LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def get(self, key, default=None, version=None):
+        row = self._select(self._key(key, version))
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self._select(key) is not None:
+                return False
+            return self._write(key, value, timeout)
+        finally:
+            connection.execute('COMMIT')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self.get_backend_timeout(timeout), self._key(key, version))
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        return self._select(self._key(key, version)) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._select(key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        finally:
+            connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        pass
@@ -0,0 +1,188 @@
+import logging
+import random
+import re
+import time
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .profiling import RequestProfile, install_template_timing
+from .static import accepted_encodings, brotli
+
+logger = logging.getLogger(__name__)
+
+
+def show_timing(request):
+    """
+    Заголовки с таймингами видны только при DEBUG, с PROFILING_HEADERS
+    или сотрудникам: остальным клиентам они не нужны и раскрывают
+    устройство сервера.
+    """
+    if settings.DEBUG or settings.PROFILING_HEADERS:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def add_server_timing(response, value):
+    """Дописывает метрики к заголовку Server-Timing, не затирая чужие"""
+    if response.has_header('Server-Timing'):
+        value = f'{response["Server-Timing"]}, {value}'
+    response['Server-Timing'] = value
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует долю запросов PROFILING_SAMPLE_RATE: время SQL, шаблонов
+    и обработки изображений попадает в лог и в заголовок Server-Timing,
+    время и число отрисовок каждого шаблона — в X-Template-Timing,
+    стеки — в файлы *.folded в PROFILING_DIR. Заголовки получают
+    только те, кому их разрешает show_timing. При нулевой доле
+    middleware отключается целиком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        install_template_timing()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        profile = RequestProfile(settings.PROFILING_INTERVAL)
+        with profile.activate():
+            response = self.get_response(request)
+        server_timing = profile.server_timing()
+        template_timing = profile.template_timing()
+        if show_timing(request):
+            add_server_timing(response, server_timing)
+            response['X-Template-Timing'] = template_timing
+        filename = profile.dump(settings.PROFILING_DIR, request.path)
+        logger.info(
+            '%s %s %s; шаблоны: %s; профиль: %s',
+            request.method, request.path, server_timing, template_timing,
+            filename
+        )
+        return response
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, content):
+        return self.compressor.compress(content)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+
+    def compress(self, content):
+        return self.compressor.process(content)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def get_compressor(request):
+    """Сжатие, которое принимает клиент: Brotli, если пакет установлен"""
+    accepted = accepted_encodings(request)
+    if brotli is not None and 'br' in accepted:
+        return BrotliCompressor()
+    if 'gzip' in accepted:
+        return GzipCompressor()
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы типов COMPRESSION_CONTENT_TYPES не меньше
+    COMPRESSION_MIN_SIZE байт в Brotli или gzip. Потоковые ответы
+    сжимаются по частям, и каждая часть сразу уходит клиенту.
+    Процессорное время сжатия попадает в Server-Timing как compress,
+    если show_timing разрешает заголовок, у потоковых ответов — в лог
+    после отправки.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        compressor = get_compressor(request)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if compressor is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                request, response.streaming_content, compressor
+            )
+            del response['Content-Length']
+        else:
+            start = time.thread_time()
+            content = compressor.compress(response.content)
+            content += compressor.finish()
+            cpu_time = time.thread_time() - start
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+            if show_timing(request):
+                add_server_timing(
+                    response, f'compress;dur={cpu_time * 1000:.1f}'
+                )
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        response['Content-Encoding'] = compressor.encoding
+        return response
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type.strip() not in settings.COMPRESSION_CONTENT_TYPES:
+            return False
+        if response.streaming:
+            size = response.get('Content-Length')
+        else:
+            size = len(response.content)
+        return size is None or int(size) >= settings.COMPRESSION_MIN_SIZE
+
+    def compress_stream(self, request, content, compressor):
+        cpu_time = 0
+        for chunk in content:
+            start = time.thread_time()
+            compressed = compressor.compress(chunk) + compressor.flush()
+            cpu_time += time.thread_time() - start
+            yield compressed
+        start = time.thread_time()
+        yield compressor.finish()
+        cpu_time += time.thread_time() - start
+        logger.info(
+            '%s %s compress;dur=%.1f',
+            request.method, request.path, cpu_time * 1000
+        )
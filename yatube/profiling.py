@@ -0,0 +1,203 @@
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connections
+from django.template.base import Template
+
+_local = threading.local()
+
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def timed(category):
+    """Учитывает время блока в профиле запроса, если он собирается"""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    with profile.measure(category):
+        yield
+
+
+def timed_function(category):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if current_profile() is None:
+                return function(*args, **kwargs)
+            with timed(category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_template_timing():
+    """
+    Оборачивает Template.render один раз: время и число отрисовок
+    учитываются по каждому шаблону, в том числе подключённому
+    через {% include %}.
+    """
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    @wraps(render)
+    def profiled_render(self, context):
+        profile = current_profile()
+        if profile is None:
+            return render(self, context)
+        with profile.measure('template'):
+            with profile.measure_template(self.name or '<string>'):
+                return render(self, context)
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def collapse(frame):
+    """
+    Стек кадра в формате collapsed stacks: имена кадров через «;»
+    без пробелов, иначе строка не разбирается flamegraph.pl
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        name = f'{module}:{code.co_name}'
+        names.append(re.sub(r'[\s;]+', '_', name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек потока запроса каждые interval секунд"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            del frame
+            if self.finished.wait(self.interval):
+                return
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+class RequestProfile:
+    """
+    Профиль одного запроса: время SQL, шаблонов и обработки изображений
+    и сэмплы стека для flamegraph.
+    """
+
+    def __init__(self, interval):
+        self.timings = Counter()
+        self.depth = Counter()
+        self.templates = {}
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.total = 0
+
+    @contextmanager
+    def measure(self, category):
+        self.depth[category] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[category] -= 1
+            if not self.depth[category]:
+                self.timings[category] += time.perf_counter() - start
+
+    @contextmanager
+    def measure_template(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            count, duration = self.templates.get(name, (0, 0))
+            self.templates[name] = (
+                count + 1, duration + time.perf_counter() - start
+            )
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        with self.measure('sql'):
+            return execute(sql, params, many, context)
+
+    @contextmanager
+    def activate(self):
+        _local.profile = self
+        self.sampler.start()
+        start = time.perf_counter()
+        try:
+            with self.wrap_connections():
+                yield self
+        finally:
+            self.total = time.perf_counter() - start
+            self.sampler.stop()
+            _local.profile = None
+
+    @contextmanager
+    def wrap_connections(self):
+        wrapped = []
+        try:
+            for connection in connections.all():
+                connection.execute_wrappers.append(self.execute_wrapper)
+                wrapped.append(connection)
+            yield
+        finally:
+            for connection in wrapped:
+                connection.execute_wrappers.remove(self.execute_wrapper)
+
+    def server_timing(self):
+        timings = [
+            (category, self.timings[category])
+            for category in ('sql', 'template', 'thumbnails')
+        ]
+        timings.append(('total', self.total))
+        return ', '.join(
+            f'{category};dur={duration * 1000:.1f}'
+            for category, duration in timings
+        )
+
+    def template_timing(self):
+        """Шаблоны по убыванию суммарного времени отрисовки с вложенными"""
+        templates = sorted(
+            self.templates.items(), key=lambda item: item[1][1], reverse=True
+        )
+        return ', '.join(
+            f'{name};count={count};dur={duration * 1000:.1f}'
+            for name, (count, duration) in templates
+        )
+
+    def dump(self, directory, path):
+        """Записывает стеки в формате collapsed stacks для flamegraph.pl"""
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^\w-]+', '_', path).strip('_') or 'index'
+        filename = os.path.join(
+            directory,
+            f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{name}-'
+            f'{uuid.uuid4().hex[:8]}.folded'
+        )
+        with open(filename, 'w') as profile_file:
+            for stack, count in self.sampler.stacks.most_common():
+                profile_file.write(f'{stack} {count}\n')
+        return filename
@@ -24,10 +24,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.middleware.ProfilingMiddleware',
+    'yatube.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -35,13 +36,25 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar сам замедляет каждый запрос, поэтому подключается только
+# при разработке
+DEBUG_TOOLBAR = DEBUG and os.environ.get('YATUBE_DEBUG_TOOLBAR', '1') == '1'
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -59,6 +72,20 @@ TEMPLATES = [
     },
 ]
 
+# При разработке шаблоны разбираются заново на каждый запрос.
+# С YATUBE_TEMPLATE_RELOAD=1 они кэшируются и перекомпилируются только
+# после изменения файла — так ведёт себя продакшен, но без перезапуска
+TEMPLATE_RELOAD = DEBUG and os.environ.get('YATUBE_TEMPLATE_RELOAD') == '1'
+
+if TEMPLATE_RELOAD:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('yatube.template_loaders.ReloadingLoader', TEMPLATE_LOADERS),
+    ]
+
+# Компилировать ли все шаблоны при старте воркера, см. yatube/wsgi.py
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
@@ -99,6 +126,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдавать статику и медиафайлы самим приложением при выключенном DEBUG,
+# если перед ним нет CDN или отдельного веб-сервера
+SERVE_FILES = False
+
+# Маленькие файлы держатся в памяти, большие пишутся во временный файл
+# частями. Временный файл создаётся с правами 0600 и при сохранении
+# переносится как есть, поэтому права задаются явно, иначе веб-сервер
+# не сможет отдать изображение
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_PERMISSIONS = 0o644
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 LOGOUT_REDIRECT_URL = "index"
@@ -107,12 +148,69 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# locmem — кэш внутри процесса, годится для разработки и тестов.
+# sqlite — общий для всех воркеров кэш без внешних сервисов, redis —
+# сервер с протоколом Redis (нужен пакет django-redis). Файловый кэш
+# Django не подходит: его add и incr не атомарны между процессами,
+# а на них держатся счётчики поколений ключей страниц.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            'redis://127.0.0.1:6379/1'
+        ),
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
     }
 }
 
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+
+# Доля профилируемых запросов от 0 до 1, интервал снятия стека в секундах
+# и каталог для профилей в формате collapsed stacks
+PROFILING_SAMPLE_RATE = float(os.environ.get('YATUBE_PROFILING_RATE', 0))
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.environ.get(
+    'YATUBE_PROFILING_DIR',
+    os.path.join(BASE_DIR, 'profiles')
+)
+# Отдавать Server-Timing и X-Template-Timing всем клиентам, а не только
+# при DEBUG и сотрудникам
+PROFILING_HEADERS = os.environ.get('YATUBE_PROFILING_HEADERS') == '1'
+
+# Сжатие ответов: наименьший размер в байтах, сжимаемые типы и уровни.
+# Brotli используется, если установлен пакет brotli
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
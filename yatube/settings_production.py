@@ -0,0 +1,60 @@
+"""
+Настройки для продакшена: DJANGO_SETTINGS_MODULE=yatube.settings_production
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import (CACHE_BACKENDS, INSTALLED_APPS, MIDDLEWARE,
+                       TEMPLATE_LOADERS, TEMPLATES)
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Не задана переменная YATUBE_SECRET_KEY')
+
+ALLOWED_HOSTS = os.environ.get(
+    'YATUBE_ALLOWED_HOSTS', 'localhost,127.0.0.1'
+).split(',')
+
+# Счётчики поколений кэша и ETag страниц должны быть общими для всех
+# воркеров, поэтому по умолчанию кэш хранится в SQLite, а не в памяти
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'sqlite')
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
+    }
+}
+
+DEBUG_TOOLBAR = False
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar.')
+]
+
+# Шаблоны компилируются один раз на воркер и больше не читаются с диска
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
+        },
+    },
+]
+
+# Имена статики с хэшем содержимого и заранее сжатые копии .gz и .br
+STATICFILES_STORAGE = 'yatube.static.CompressedManifestStaticFilesStorage'
+
+SERVE_FILES = os.environ.get('YATUBE_SERVE_FILES', '1') == '1'
+
+TEMPLATE_RELOAD = False
+TEMPLATE_WARMUP = True
@@ -0,0 +1,148 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml',
+)
+
+"""Файлы меньше этого размера в байтах не сжимаются заранее"""
+COMPRESS_MIN_SIZE = 512
+
+"""Кодировки в порядке предпочтения: заголовок Accept-Encoding и суффикс"""
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CACHE_CONTROL = 'public, max-age=3600'
+
+# Хэш в имени: app.f03ae80d0919.css у статики, sha256 и его варианты
+# posts/<sha256>_480.webp у изображений записей, имена кэша sorl-thumbnail
+HASHED_NAME = re.compile(r'(?:^|[/.])[0-9a-f]{12,64}(?:_\d+)?\.[^/.]+$')
+
+
+def compress_gzip(content):
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def compress_brotli(content):
+    return brotli.compress(content, quality=11)
+
+
+def get_compressors():
+    compressors = [('.gz', compress_gzip)]
+    if brotli is not None:
+        compressors.insert(0, ('.br', compress_brotli))
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хэшем содержимого в имени, рядом с которой collectstatic
+    кладёт сжатые копии .gz и, если установлен пакет brotli, .br.
+    Сжатая копия остаётся, только если она меньше исходного файла.
+    """
+
+    def post_process(self, *args, **kwargs):
+        hashed_names = {}
+        for name, hashed_name, processed in super().post_process(
+            *args, **kwargs
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names[name] = hashed_name
+            yield name, hashed_name, processed
+        for hashed_name in hashed_names.values():
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        for suffix, compressor in get_compressors():
+            compressed = compressor(content)
+            if len(compressed) >= len(content):
+                continue
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0"""
+    encodings = set()
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.partition(';')
+        if re.fullmatch(r'\s*q\s*=\s*0(\.0*)?\s*', params):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_file(request, fullpath):
+    """Сжатая копия, которую принимает клиент, или сам файл"""
+    accepted = accepted_encodings(request)
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.isfile(fullpath + suffix):
+            return fullpath + suffix, encoding
+    return fullpath, None
+
+
+@require_safe
+def serve(request, path, document_root):
+    """
+    Отдаёт статику и медиафайлы без DEBUG: с ETag, ответом 304,
+    заранее сжатыми копиями и FileResponse, который сервер приложения
+    может отправить через sendfile. Файлы с хэшем в имени кэшируются
+    клиентом навсегда.
+    """
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    filename, encoding = choose_file(request, fullpath)
+    stat = os.stat(filename)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    cache_control = (
+        IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else CACHE_CONTROL
+    )
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in (tag.replace('W/', '', 1) for tag in etags):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(filename, 'rb'))
+        content_type = mimetypes.guess_type(fullpath)[0]
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def file_urlpatterns(prefix, document_root):
+    return [
+        re_path(
+            r'^%s(?P<path>.*)$' % re.escape(prefix.lstrip('/')),
+            serve,
+            {'document_root': document_root}
+        ),
+    ]
@@ -0,0 +1,75 @@
+import logging
+import os
+
+from django.template import Template, TemplateSyntaxError, engines
+from django.template.loaders import cached
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadingLoader(cached.Loader):
+    """
+    Кэширующий загрузчик, который перекомпилирует шаблон, если его файл
+    изменился. Нужен только при разработке: на каждый запрос шаблона
+    приходится обращение к файловой системе.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine, loaders)
+        self.mtimes = {}
+
+    def get_template(self, template_name, skip=None):
+        key = self.cache_key(template_name, skip)
+        template = self.get_template_cache.get(key)
+        if isinstance(template, Template) and self.is_stale(template.origin):
+            del self.get_template_cache[key]
+        template = super().get_template(template_name, skip)
+        self.mtimes.setdefault(
+            template.origin.name, self.get_mtime(template.origin)
+        )
+        return template
+
+    def get_mtime(self, origin):
+        try:
+            return os.path.getmtime(origin.name)
+        except OSError:
+            return None
+
+    def is_stale(self, origin):
+        mtime = self.get_mtime(origin)
+        if self.mtimes.get(origin.name) == mtime:
+            return False
+        self.mtimes[origin.name] = mtime
+        return True
+
+    def reset(self):
+        super().reset()
+        self.mtimes.clear()
+
+
+def find_templates(directory):
+    """Имена всех шаблонов каталога относительно него самого"""
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith('.html'):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm_templates():
+    """
+    Компилирует все шаблоны из DIRS каждого движка, чтобы первый запрос
+    к воркеру не тратил время на разбор base.html и подключаемых
+    шаблонов. Имеет смысл только с кэширующим загрузчиком.
+    """
+    count = 0
+    for engine in engines.all():
+        for directory in getattr(engine, 'dirs', ()):
+            for name in sorted(find_templates(directory)):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Шаблон %s не компилируется', name)
+                    continue
+                count += 1
+    return count
@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from yatube.static import file_urlpatterns
+
 handler404 = 'posts.views.page_not_found'
 handler500 = 'posts.views.server_error'
 
@@ -21,11 +23,16 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    import debug_toolbar
-
     urlpatterns += static(settings.MEDIA_URL,
                           document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL,
                           document_root=settings.STATIC_ROOT)
+elif settings.SERVE_FILES:
+    urlpatterns += file_urlpatterns(settings.MEDIA_URL, settings.MEDIA_ROOT)
+    urlpatterns += file_urlpatterns(settings.STATIC_URL, settings.STATIC_ROOT)
+
+if settings.DEBUG_TOOLBAR:
+    import debug_toolbar
+
     urlpatterns += (path('__debug__/',
                     include(debug_toolbar.urls)),)